@@ -1,10 +1,290 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, g, request
 from flask_cors import CORS
+import click
 import mysql.connector
+from mysql.connector import errorcode
 from config import Config
+from services.cache import TTLCache
+from services.change_log import ChangeLog
+from services.comment_store import CommentStore
+from services.compression import compress_response
+from services.counters import CounterBuffer
+from services.db_pool import ConnectionPool, PoolTimeout, PooledConnection
+from services.event_bus import EventBus
+from services.genre_cache import GenreCache
+from services.id_generator import IdGenerator, WorkerIdRegistry
+from services.journal import Journal
+from services.metrics import Metrics
+from services.migrations import LATEST_VERSION, migrate, schema_version
+from services.password_hasher import PasswordHasher
+from services.post_index import PostIndex
+from services.post_store import create_post_store, import_posts_dir
+from services.ranking import PostRanking
+from services.rate_limiter import create_rate_limiter
+from services.search_index import SearchIndex
+from services.static_assets import StaticAssets
+from services.timelines import TimelineStore
+from services.vote_ledger import VoteLedger, reconcile_counts
+import atexit
+import gc
 import os
+import time
+from functools import partial
 
-def create_app():
+def connect_mysql(config, database=True):
+    return mysql.connector.connect(
+        host=config['MYSQL_HOST'],
+        user=config['MYSQL_USER'],
+        password=config['MYSQL_PASSWORD'],
+        **({'database': config['MYSQL_DB']} if database else {})
+    )
+
+def run_migrations(config):
+    conn = connect_mysql(config, database=False)
+    try:
+        return migrate(conn, config['MYSQL_DB'])
+    finally:
+        conn.close()
+
+def init_db(config):
+    # Startup costs one schema_version query; DDL only runs when a
+    # migration is pending (see services/migrations.py and migrate.py)
+    try:
+        conn = connect_mysql(config)
+        try:
+            version = schema_version(conn)
+        finally:
+            conn.close()
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_BAD_DB_ERROR:
+            print(f"Database initialization error: {err}")
+            raise
+        version = 0
+    
+    if version >= LATEST_VERSION:
+        return
+    
+    if not config['AUTO_MIGRATE']:
+        raise RuntimeError(
+            f"Database schema is at version {version}, this code needs {LATEST_VERSION}; "
+            f"run `python migrate.py` first"
+        )
+    
+    try:
+        run_migrations(config)
+        print("Database initialized successfully!")
+    except mysql.connector.Error as err:
+        print(f"Database initialization error: {err}")
+        raise
+
+def init_metrics(app):
+    app.metrics = Metrics()
+    app.metrics.describe('blog_requests_total', 'HTTP requests by endpoint and status')
+    app.metrics.describe('blog_request_seconds', 'Time spent handling HTTP requests')
+    app.metrics.describe('blog_db_queries_total', 'MySQL statements executed')
+    app.metrics.describe('blog_db_query_seconds', 'MySQL statement round-trip time')
+    app.metrics.describe('blog_db_pool_wait_seconds', 'Time spent waiting for a pooled connection')
+    app.metrics.describe('blog_post_store_io_total', 'Post store reads and writes')
+    app.metrics.describe('blog_post_store_io_bytes_total', 'Post data read and written')
+    app.metrics.describe('blog_post_store_io_seconds', 'Post store read and write time')
+
+def record_request(metrics, endpoint, method, status, seconds):
+    # Label by view name, not path, so ids in URLs don't explode the series
+    endpoint = endpoint or 'unmatched'
+    metrics.observe('blog_request_seconds', seconds, endpoint=endpoint)
+    metrics.inc('blog_requests_total', endpoint=endpoint, method=method, status=status)
+
+def record_query(metrics, operation, seconds):
+    statement = operation.split(None, 1)[0].upper() if operation.strip() else 'UNKNOWN'
+    metrics.inc('blog_db_queries_total', statement=statement)
+    metrics.observe('blog_db_query_seconds', seconds, statement=statement)
+
+def record_post_io(metrics, op, nbytes, seconds):
+    metrics.inc('blog_post_store_io_total', op=op)
+    metrics.inc('blog_post_store_io_bytes_total', nbytes, op=op)
+    metrics.observe('blog_post_store_io_seconds', seconds, op=op)
+
+def posts_dir_writable(config):
+    # The post store can still write where it keeps its data
+    if config['POST_STORE'] == 'json':
+        posts_dir = config['POSTS_DIR']
+    else:
+        posts_dir = os.path.dirname(os.path.abspath(config['POSTS_DB']))
+    return os.path.isdir(posts_dir) and os.access(posts_dir, os.W_OK)
+
+def init_services(app):
+    # The in-process services both the WSGI and ASGI apps share; the
+    # caller attaches db_pool and genre_cache, which differ between them
+    
+    # Every write is journaled and applied from the journal in each process,
+    # so workers see each other's posts, counts and genre changes
+    from routes.posts import apply_journal_entry
+    app.journal = Journal(
+        app.config['JOURNAL_DB'],
+        apply=partial(apply_journal_entry, app),
+        resync=partial(resync_posts, app),
+        size=app.config['JOURNAL_SIZE'],
+        interval=app.config['JOURNAL_POLL_INTERVAL']
+    )
+    app.change_log = new_change_log(app, app.journal.position)
+    app.event_bus = EventBus(queue_size=app.config['STREAM_QUEUE_SIZE'])
+    
+    app.rate_limiter = create_rate_limiter(app.config)
+    
+    # Verified JWTs by SHA-256 digest -> user_id, expiring with the token
+    app.token_cache = TTLCache(
+        maxsize=app.config['TOKEN_CACHE_SIZE'],
+        ttl=app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    )
+    
+    app.password_hasher = PasswordHasher(
+        rounds=app.config['BCRYPT_ROUNDS'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+    
+    # Post storage backend, plus an index of every post loaded once;
+    # routes keep the index current from here on
+    app.post_store = create_post_store(app.config)
+    app.post_store.io_observer = partial(record_post_io, app.metrics)
+    # Each process, forked workers included, leases its own worker id
+    app.id_generator = IdGenerator(registry=WorkerIdRegistry(
+        app.config['WORKER_IDS_DB'],
+        first=app.config['POST_ID_WORKER_ID']
+    ))
+    app.vote_ledger = VoteLedger(app.config['VOTES_DB'])
+    # Workers still running from before (the old ones during a USR2
+    # upgrade) may have vote counts not yet flushed, so only reconcile alone
+    load_posts(app, reconcile_votes=not app.id_generator.registry.holders())
+    app.search_index_owner = os.getpid()
+    atexit.register(save_search_index, app)
+    app.counters = CounterBuffer(
+        app.post_store,
+        app.post_index,
+        shards=app.config['COUNTER_SHARDS'],
+        flush_interval=app.config['COUNTER_FLUSH_INTERVAL'],
+        on_flush=partial(app.journal.write_many, 'counters')
+    )
+    app.counters.start()
+    app.journal.start()
+    app.comment_store = CommentStore(app.config['COMMENTS_DB'])
+    
+    # Values the services already track, read when /metrics is scraped
+    def collect_metrics():
+        caches = {'tokens': app.token_cache.stats()}
+        caches.update({f'genres_{name}': stats for name, stats in app.genre_cache.stats().items()})
+        for cache, stats in caches.items():
+            yield 'blog_cache_hits_total', 'counter', {'cache': cache}, stats['hits']
+            yield 'blog_cache_misses_total', 'counter', {'cache': cache}, stats['misses']
+            yield 'blog_cache_entries', 'gauge', {'cache': cache}, stats['size']
+        pool = app.db_pool.stats()
+        yield 'blog_db_pool_size', 'gauge', {}, pool['size']
+        yield 'blog_db_pool_idle', 'gauge', {}, pool['idle']
+        yield 'blog_stream_subscribers', 'gauge', {}, app.event_bus.subscriber_count()
+        if app.timelines is not None:
+            timelines = app.timelines.stats()
+            yield 'blog_timeline_users', 'gauge', {}, timelines['users']
+            yield 'blog_timeline_large_genres', 'gauge', {}, timelines['large_genres']
+    
+    app.metrics.add_collector(collect_metrics)
+
+def load_posts(app, reconcile_votes=False):
+    # The post index and everything derived from it, read from the store.
+    # reconcile_votes first repairs vote counts from the vote ledger, which
+    # is only safe while no other process has counter deltas pending.
+    app.post_index = PostIndex.load(app.post_store)
+    if reconcile_votes:
+        fixed = reconcile_counts(app.vote_ledger, app.post_store, app.post_index)
+        if fixed:
+            print(f"Corrected vote counts of {fixed} posts from the vote ledger")
+    app.ranking = PostRanking.build(
+        app.post_index.all(),
+        share_weight=app.config['RANKING_SHARE_WEIGHT'],
+        hot_period=app.config['HOT_SCORE_PERIOD']
+    )
+    app.search_index = SearchIndex.build(app.post_index.all(), app.config['SEARCH_INDEX_PATH'])
+    
+    # Optional per-user timelines in front of the index for 'new' feeds
+    app.timelines = None
+    if app.config['FEED_TIMELINES']:
+        app.timelines = TimelineStore(
+            app.post_index,
+            size=app.config['TIMELINE_SIZE'],
+            max_users=app.config['TIMELINE_MAX_USERS'],
+            fanout_limit=app.config['TIMELINE_FANOUT_LIMIT']
+        )
+
+def new_change_log(app, start):
+    # Per-genre versions for ETags and delta feeds, numbered by the journal
+    # from entry `start` on
+    return ChangeLog(
+        size=app.config['CHANGE_LOG_SIZE'],
+        log_id=app.journal.id,
+        start=start
+    )
+
+def resync_posts(app, position):
+    # Rebuild the post state from the stores, which hold every write up to
+    # journal entry `position`, when the journal can't be replayed up to it
+    load_posts(app)
+    app.counters.index = app.post_index
+    app.change_log = new_change_log(app, position)
+
+def save_search_index(app):
+    # Registered with atexit. Only the process serving from the index
+    # writes it, so a pre-fork master exiting after its workers can't
+    # overwrite their newer copy with the one it built at boot
+    path = app.config['SEARCH_INDEX_PATH']
+    if path and app.search_index_owner == os.getpid():
+        app.search_index.save(path)
+
+def prepare_for_fork(app):
+    # Run once in a pre-fork master after create_app. Warm state built
+    # here is inherited copy-on-write by every worker; threads and MySQL
+    # sockets must not cross the fork, so they are let go of here
+    with app.app_context():
+        app.genre_cache.genres()
+    
+    app.journal.stop()
+    app.counters.stop()
+    app.db_pool.close()
+    # Workers own the search index from here on
+    app.search_index_owner = None
+    
+    # Keep the inherited objects out of the cyclic GC so collections in
+    # the workers don't touch (and copy) their pages
+    gc.freeze()
+
+def reset_after_fork(app, reload=True):
+    # Run in each worker right after fork. The inherited post state is the
+    # master's copy from boot. A worker forked straight after boot
+    # (reload=False) replays the journal from there; later ones rebuild
+    # from the stores rather than replay everything written since.
+    app.post_store.reopen()
+    app.vote_ledger.reopen()
+    app.comment_store.reopen()
+    app.rate_limiter.backend.reopen()
+    app.journal.reopen()
+    
+    if reload:
+        position = app.journal.end()
+        resync_posts(app, position)
+        app.journal.position = position
+    else:
+        # A fresh boot id: genre ETags are only valid within one process
+        app.change_log = new_change_log(app, app.journal.position)
+    app.search_index_owner = os.getpid()
+    
+    # Lease a worker id up front, so a new master started next to this
+    # worker (USR2) knows it is running; see init_services
+    app.id_generator.worker_id
+    app.counters.start()
+    app.journal.start()
+
+def create_app(config_class=Config, connect_db=None):
+    # connect_db replaces the MySQL connection factory (the benchmarks pass
+    # a SQLite stand-in); the caller then owns schema setup
     app = Flask(__name__)
     
     # Configure CORS to allow requests from any origin
@@ -12,129 +292,84 @@ def create_app():
         r"/*": {
             "origins": "*",
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+            "expose_headers": ["ETag", "Retry-After", "X-Next-Cursor", "X-Feed-Version"]
         }
     })
     
     # Initialize config
-    app.config.from_object(Config)
-    Config.init_app(app)
+    app.config.from_object(config_class)
+    config_class.init_app(app)
     
-    # Database connection
-    def get_db():
-        return mysql.connector.connect(
-            host=app.config['MYSQL_HOST'],
-            user=app.config['MYSQL_USER'],
-            password=app.config['MYSQL_PASSWORD'],
-            database=app.config['MYSQL_DB']
+    # Request, query and post-store timings, rendered at /metrics
+    init_metrics(app)
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def finish_request_timer(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            record_request(
+                app.metrics, request.endpoint, request.method,
+                response.status_code, time.perf_counter() - started
+            )
+        return response
+    
+    @app.after_request
+    def compress(response):
+        return compress_response(
+            response, request.accept_encodings,
+            app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL']
         )
     
+    # Database connection pool
+    app.db_pool = ConnectionPool(
+        connect_db or partial(connect_mysql, app.config),
+        size=app.config['MYSQL_POOL_SIZE'],
+        timeout=app.config['MYSQL_POOL_TIMEOUT']
+    )
+    
+    # One pooled connection per request, returned on teardown
+    def get_db():
+        if 'db' not in g:
+            started = time.perf_counter()
+            conn = app.db_pool.acquire()
+            app.metrics.observe('blog_db_pool_wait_seconds', time.perf_counter() - started)
+            g.db = PooledConnection(app.db_pool, conn, on_query=partial(record_query, app.metrics))
+        return g.db
+    
+    @app.teardown_appcontext
+    def release_db(exception):
+        conn = g.pop('db', None)
+        if conn is not None:
+            conn.release()
+    
     # Make get_db available to routes
     app.get_db = get_db
     
-    # Initialize database
-    def init_db():
-        try:
-            # First, create the database if it doesn't exist
-            conn = mysql.connector.connect(
-                host=app.config['MYSQL_HOST'],
-                user=app.config['MYSQL_USER'],
-                password=app.config['MYSQL_PASSWORD']
-            )
-            cursor = conn.cursor()
-            
-            # Create database if it doesn't exist
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {app.config['MYSQL_DB']}")
-            cursor.execute(f"USE {app.config['MYSQL_DB']}")
-            
-            # Check if users table exists and get its columns
-            cursor.execute("SHOW TABLES LIKE 'users'")
-            users_table_exists = cursor.fetchone() is not None
-            
-            if users_table_exists:
-                # Check if has_selected_genres column exists
-                cursor.execute("SHOW COLUMNS FROM users LIKE 'has_selected_genres'")
-                has_column = cursor.fetchone() is not None
-                
-                if not has_column:
-                    print("Adding has_selected_genres column to users table...")
-                    cursor.execute('''
-                        ALTER TABLE users 
-                        ADD COLUMN has_selected_genres BOOLEAN DEFAULT FALSE
-                    ''')
-                    conn.commit()
-            else:
-                # Create users table with all columns
-                cursor.execute('''
-                    CREATE TABLE users (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        username VARCHAR(50) UNIQUE NOT NULL,
-                        email VARCHAR(100) UNIQUE NOT NULL,
-                        password VARCHAR(255) NOT NULL,
-                        has_selected_genres BOOLEAN DEFAULT FALSE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-            
-            # Create genres table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS genres (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    name VARCHAR(50) UNIQUE NOT NULL
-                )
-            ''')
-            
-            # Create user_genres table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_genres (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    genre_id INT NOT NULL,
-                    FOREIGN KEY (user_id) REFERENCES users(id),
-                    FOREIGN KEY (genre_id) REFERENCES genres(id),
-                    UNIQUE KEY unique_user_genre (user_id, genre_id)
-                )
-            ''')
-            
-            # Insert default genres
-            default_genres = [
-                'Technology', 'Science', 'Arts', 'Literature', 
-                'Music', 'Travel', 'Food', 'Sports', 'Gaming',
-                'Movies', 'Politics', 'Health', 'Education'
-            ]
-            
-            for genre in default_genres:
-                try:
-                    cursor.execute('INSERT INTO genres (name) VALUES (%s)', (genre,))
-                except mysql.connector.IntegrityError:
-                    # Genre already exists
-                    pass
-            
-            # Update has_selected_genres for existing users based on user_genres
-            cursor.execute('''
-                UPDATE users u 
-                SET has_selected_genres = EXISTS (
-                    SELECT 1 FROM user_genres ug 
-                    WHERE ug.user_id = u.id 
-                    GROUP BY ug.user_id 
-                    HAVING COUNT(*) >= 3
-                )
-                WHERE has_selected_genres IS NULL
-            ''')
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            print("Database initialized successfully!")
-            
-        except mysql.connector.Error as err:
-            print(f"Database initialization error: {err}")
-            raise
+    # Genre data changes rarely; cache it in front of MySQL
+    app.genre_cache = GenreCache(
+        get_db,
+        ttl=app.config['GENRE_CACHE_TTL'],
+        max_users=app.config['GENRE_CACHE_MAX_USERS']
+    )
     
-    # Initialize database tables
-    with app.app_context():
-        init_db()
+    # Check the schema version, migrating if needed
+    if connect_db is None:
+        init_db(app.config)
+    
+    init_services(app)
+    
+    @app.cli.command('import-posts')
+    @click.argument('posts_dir', required=False)
+    def import_posts_command(posts_dir):
+        """Import a JSON posts directory into the configured post store."""
+        posts_dir = posts_dir or app.config['POSTS_DIR']
+        count = import_posts_dir(posts_dir, app.post_store)
+        print(f"Imported {count} posts from {posts_dir} into the {app.config['POST_STORE']} store")
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -145,9 +380,43 @@ def create_app():
     app.register_blueprint(genres_bp, url_prefix='/genres')
     app.register_blueprint(posts_bp, url_prefix='/posts')
     
+    # Optionally serve the frontend as well, prepared once up front
+    if app.config['SERVE_FRONTEND']:
+        from routes.frontend import frontend_bp
+        app.static_assets = StaticAssets(
+            app.config['FRONTEND_DIR'],
+            max_age=app.config['STATIC_MAX_AGE'],
+            min_size=app.config['COMPRESS_MIN_SIZE']
+        )
+        app.register_blueprint(frontend_bp)
+    
     @app.route('/health')
     def health_check():
-        return jsonify({'status': 'healthy'})
+        checks = {}
+        
+        # MySQL answers a trivial query
+        try:
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            cursor.close()
+            checks['database'] = 'ok'
+        except Exception as e:
+            print(f"Health check database error: {str(e)}")
+            checks['database'] = 'error'
+        
+        checks['posts_dir'] = 'ok' if posts_dir_writable(app.config) else 'error'
+        
+        healthy = all(status == 'ok' for status in checks.values())
+        return jsonify({
+            'status': 'healthy' if healthy else 'unhealthy',
+            'checks': checks
+        }), 200 if healthy else 503
+    
+    @app.route('/metrics')
+    def metrics():
+        return Response(app.metrics.render(), mimetype='text/plain; version=0.0.4')
     
     # Error handlers
     @app.errorhandler(404)
@@ -158,6 +427,11 @@ def create_app():
     def internal_error(error):
         return jsonify({'error': 'Internal Server Error'}), 500
 
+    @app.errorhandler(PoolTimeout)
+    def pool_timeout_error(error):
+        print(f"Database pool exhausted: {str(error)}")
+        return jsonify({'error': 'Service Unavailable'}), 503, {'Retry-After': '1'}
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+from app import init_db, init_metrics, init_services, posts_dir_writable, record_query, record_request
+from config import Config
+from services.async_db import AsyncConnectionPool
+from services.db_pool import PoolTimeout
+from services.genre_cache import AsyncGenreCache
+from services.static_assets import StaticAssets
+from async_routes.http_cache import compress_response
+from functools import partial
+import time
+
+# Async serving mode: the same API and services as app.py on Quart, with
+# MySQL through aiomysql. Run with an ASGI server, e.g.
+#   hypercorn asgi:app --bind 0.0.0.0:5000
+# or keep using `python app.py` for the threaded Flask server.
+
+def create_async_app(config_class=Config):
+    app = Quart(__name__)
+    app = cors(
+        app,
+        allow_origin='*',
+        allow_methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+        allow_headers=['Content-Type', 'Authorization', 'If-None-Match'],
+        expose_headers=['ETag', 'Retry-After', 'X-Next-Cursor', 'X-Feed-Version']
+    )
+    
+    app.config.from_object(config_class)
+    config_class.init_app(app)
+    
+    init_metrics(app)
+    
+    @app.before_request
+    async def start_request_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    async def finish_request_timer(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            record_request(
+                app.metrics, request.endpoint, request.method,
+                response.status_code, time.perf_counter() - started
+            )
+        return response
+    
+    @app.after_request
+    async def compress(response):
+        return await compress_response(
+            response, request.accept_encodings,
+            app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL']
+        )
+    
+    app.db_pool = AsyncConnectionPool(
+        host=app.config['MYSQL_HOST'],
+        user=app.config['MYSQL_USER'],
+        password=app.config['MYSQL_PASSWORD'],
+        db=app.config['MYSQL_DB'],
+        size=app.config['MYSQL_POOL_SIZE'],
+        timeout=app.config['MYSQL_POOL_TIMEOUT'],
+        on_query=partial(record_query, app.metrics),
+        on_wait=partial(app.metrics.observe, 'blog_db_pool_wait_seconds')
+    )
+    app.genre_cache = AsyncGenreCache(
+        app.db_pool,
+        ttl=app.config['GENRE_CACHE_TTL'],
+        max_users=app.config['GENRE_CACHE_MAX_USERS']
+    )
+    
+    # Schema setup is a one-off at startup, so the sync driver is fine here
+    init_db(app.config)
+    init_services(app)
+    
+    @app.before_serving
+    async def open_db_pool():
+        await app.db_pool.open()
+    
+    @app.after_serving
+    async def shutdown_services():
+        await app.db_pool.close()
+        app.journal.stop()
+        app.counters.stop()
+    
+    from async_routes.auth import auth_bp
+    from async_routes.genres import genres_bp
+    from async_routes.posts import posts_bp
+    
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(genres_bp, url_prefix='/genres')
+    app.register_blueprint(posts_bp, url_prefix='/posts')
+    
+    if app.config['SERVE_FRONTEND']:
+        from async_routes.frontend import frontend_bp
+        app.static_assets = StaticAssets(
+            app.config['FRONTEND_DIR'],
+            max_age=app.config['STATIC_MAX_AGE'],
+            min_size=app.config['COMPRESS_MIN_SIZE']
+        )
+        app.register_blueprint(frontend_bp)
+    
+    @app.route('/health')
+    async def health_check():
+        checks = {}
+        
+        try:
+            await app.db_pool.fetchall('SELECT 1', dictionary=False)
+            checks['database'] = 'ok'
+        except Exception as e:
+            print(f"Health check database error: {str(e)}")
+            checks['database'] = 'error'
+        
+        checks['posts_dir'] = 'ok' if posts_dir_writable(app.config) else 'error'
+        
+        healthy = all(status == 'ok' for status in checks.values())
+        return jsonify({
+            'status': 'healthy' if healthy else 'unhealthy',
+            'checks': checks
+        }), 200 if healthy else 503
+    
+    @app.route('/metrics')
+    async def metrics():
+        return Response(app.metrics.render(), mimetype='text/plain; version=0.0.4')
+    
+    @app.errorhandler(404)
+    async def not_found_error(error):
+        return jsonify({'error': 'Not Found'}), 404
+    
+    @app.errorhandler(500)
+    async def internal_error(error):
+        return jsonify({'error': 'Internal Server Error'}), 500
+    
+    @app.errorhandler(PoolTimeout)
+    async def pool_timeout_error(error):
+        print(f"Database pool exhausted: {str(error)}")
+        return jsonify({'error': 'Service Unavailable'}), 503, {'Retry-After': '1'}
+    
+    return app
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    app.run()
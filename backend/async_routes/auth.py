@@ -0,0 +1,168 @@
+from quart import Blueprint, request, jsonify, current_app
+import aiomysql
+import asyncio
+import jwt
+import math
+from datetime import datetime, timedelta
+from functools import wraps
+from services.db_pool import PoolTimeout
+from services.password_hasher import HasherBusy
+import hashlib
+import time
+
+# Async twin of routes/auth.py for the ASGI app
+auth_bp = Blueprint('auth', __name__)
+
+def busy_response():
+    return jsonify({'message': 'Server is busy, please try again'}), 503, {'Retry-After': '1'}
+
+def issue_token(user_id):
+    return jwt.encode({
+        'user_id': user_id,
+        'exp': datetime.utcnow() + timedelta(seconds=current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+    }, current_app.config['JWT_SECRET_KEY'])
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        
+        if not token:
+            return jsonify({'message': 'Token is missing'}), 401
+        
+        try:
+            token = token.split('Bearer ')[1]
+            # Tokens already verified by this process skip jwt.decode
+            digest = hashlib.sha256(token.encode('utf-8')).digest()
+            current_user = current_app.token_cache.get(digest)
+            if current_user is None:
+                data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+                current_user = data['user_id']
+                current_app.token_cache.set(digest, current_user, ttl=data['exp'] - time.time())
+        except:
+            return jsonify({'message': 'Token is invalid'}), 401
+        
+        return await f(current_user, *args, **kwargs)
+    
+    return decorated
+
+def rate_limit(endpoint, per='user'):
+    # services.rate_limiter.rate_limit for async views; the check runs on a
+    # thread since the SQLite backend writes to disk
+    def decorator(f):
+        @wraps(f)
+        async def decorated(*args, **kwargs):
+            key = f'user:{args[0]}' if per == 'user' else f'ip:{request.remote_addr}'
+            allowed, retry_after = await asyncio.to_thread(current_app.rate_limiter.check, endpoint, key)
+            if not allowed:
+                return jsonify({'message': 'Too many requests'}), 429, {
+                    'Retry-After': str(max(1, math.ceil(retry_after)))
+                }
+            return await f(*args, **kwargs)
+        return decorated
+    return decorator
+
+@auth_bp.route('/signup', methods=['POST'])
+@rate_limit('signup', per='ip')
+async def signup():
+    try:
+        data = await request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        username = data.get('username')
+        email = data.get('email')
+        password = data.get('password')
+        
+        if not all([username, email, password]):
+            return jsonify({'message': 'Missing required fields'}), 400
+        
+        try:
+            hashed_password = await current_app.password_hasher.hash_async(password)
+        except HasherBusy:
+            return busy_response()
+        
+        try:
+            async with current_app.db_pool.connection() as conn:
+                await conn.execute(
+                    'INSERT INTO users (username, email, password) VALUES (%s, %s, %s)',
+                    (username, email, hashed_password)
+                )
+                user_id = conn.lastrowid
+                await conn.commit()
+            
+            return jsonify({
+                'message': 'User created successfully',
+                'token': issue_token(user_id),
+                'user_id': user_id
+            }), 201
+        
+        except aiomysql.IntegrityError as e:
+            return jsonify({'message': 'Username or email already exists'}), 409
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error during signup: {str(e)}")
+            return jsonify({'message': 'An error occurred during signup'}), 500
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing signup request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', per='ip')
+async def login():
+    try:
+        data = await request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        username = data.get('username')
+        password = data.get('password')
+        
+        if not all([username, password]):
+            return jsonify({'message': 'Missing required fields'}), 400
+        
+        hasher = current_app.password_hasher
+        try:
+            async with current_app.db_pool.connection() as conn:
+                user = await conn.fetchone('SELECT * FROM users WHERE username = %s', (username,))
+                
+                if not user or not await hasher.verify_async(password, user['password']):
+                    return jsonify({'message': 'Invalid username or password'}), 401
+                
+                # Upgrade hashes made with an outdated bcrypt cost; best
+                # effort, the login succeeds either way
+                if hasher.needs_rehash(user['password']):
+                    try:
+                        await conn.execute(
+                            'UPDATE users SET password = %s WHERE id = %s',
+                            (await hasher.hash_async(password), user['id'])
+                        )
+                        await conn.commit()
+                    except Exception as e:
+                        print(f"Error upgrading password hash for user {user['id']}: {str(e)}")
+            
+            return jsonify({
+                'message': 'Login successful',
+                'token': issue_token(user['id']),
+                'user_id': user['id']
+            })
+        
+        except HasherBusy:
+            return busy_response()
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error during login: {str(e)}")
+            return jsonify({'message': 'An error occurred during login'}), 500
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing login request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
@@ -0,0 +1,14 @@
+from quart import Blueprint, Response, request, jsonify, current_app
+
+# Async twin of routes/frontend.py for the ASGI app
+frontend_bp = Blueprint('frontend', __name__)
+
+@frontend_bp.route('/', defaults={'path': 'index.html'})
+@frontend_bp.route('/<path:path>')
+async def serve_frontend(path):
+    result = current_app.static_assets.response(path, request.accept_encodings, request.if_none_match)
+    if result is None:
+        return jsonify({'error': 'Not Found'}), 404
+    
+    body, status, headers = result
+    return Response(body, status=status, headers=headers)
@@ -0,0 +1,225 @@
+from quart import Blueprint, request, jsonify, current_app
+from async_routes.auth import rate_limit, token_required
+from async_routes.http_cache import etagged_json, not_modified
+from services.db_pool import PoolTimeout
+from services.http_cache import make_etag
+import aiomysql
+import asyncio
+
+# Async twin of routes/genres.py for the ASGI app
+genres_bp = Blueprint('genres', __name__)
+
+@genres_bp.route('', methods=['GET'])
+@token_required
+async def get_genres(current_user):
+    try:
+        cache = current_app.genre_cache
+        etag = make_etag('genres', current_app.change_log.boot_id, await cache.catalog_generation())
+        return not_modified(etag) or etagged_json(await cache.genres(), etag)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error fetching genres: {str(e)}")
+        return jsonify({'message': 'Error fetching genres'}), 500
+
+@genres_bp.route('/user', methods=['GET'])
+@token_required
+async def get_user_genres(current_user):
+    try:
+        cache = current_app.genre_cache
+        etag = make_etag(
+            'user_genres', current_app.change_log.boot_id, current_user,
+            await cache.catalog_generation(), await cache.user_generation(current_user)
+        )
+        return not_modified(etag) or etagged_json(await cache.user_genres(current_user), etag)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error fetching user genres: {str(e)}")
+        return jsonify({'message': 'Error fetching user genres'}), 500
+
+@genres_bp.route('/user', methods=['POST'])
+@token_required
+async def set_user_genres(current_user):
+    try:
+        data = await request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        try:
+            genre_ids = {int(genre_id) for genre_id in data.get('genre_ids', [])}
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid genre selection'}), 400
+        
+        if len(genre_ids) < 3:
+            return jsonify({'message': 'Please select at least 3 genres'}), 400
+        
+        try:
+            async with current_app.db_pool.connection() as conn:
+                # Only touch the rows that actually change
+                rows = await conn.fetchall(
+                    'SELECT genre_id FROM user_genres WHERE user_id = %s', (current_user,), dictionary=False
+                )
+                current_ids = {row[0] for row in rows}
+                removed = sorted(current_ids - genre_ids)
+                added = sorted(genre_ids - current_ids)
+                
+                if removed:
+                    placeholders = ', '.join(['%s'] * len(removed))
+                    await conn.execute(
+                        f'DELETE FROM user_genres WHERE user_id = %s AND genre_id IN ({placeholders})',
+                        (current_user, *removed)
+                    )
+                
+                if added:
+                    await conn.executemany(
+                        'INSERT INTO user_genres (user_id, genre_id) VALUES (%s, %s)',
+                        [(current_user, genre_id) for genre_id in added]
+                    )
+                
+                await conn.execute(
+                    'UPDATE users SET has_selected_genres = TRUE WHERE id = %s',
+                    (current_user,)
+                )
+                await conn.commit()
+            
+            # Drop the cached genres in every worker
+            await asyncio.to_thread(current_app.journal.write, 'user_genres', current_user)
+            return jsonify({'message': 'User genres updated successfully'})
+        except aiomysql.Error as e:
+            print(f"Database error while updating user genres: {str(e)}")
+            return jsonify({'message': 'Invalid genre selection'}), 400
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing genre update request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@genres_bp.route('/bulk-assign', methods=['POST'])
+@token_required
+async def bulk_assign_genres(current_user):
+    # Admin only: add the same genres to a whole cohort of users at once
+    if current_user not in current_app.config['ADMIN_USER_IDS']:
+        return jsonify({'message': 'Admin access required'}), 403
+    
+    try:
+        data = await request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        try:
+            user_ids = sorted({int(user_id) for user_id in data.get('user_ids', [])})
+            genre_ids = sorted({int(genre_id) for genre_id in data.get('genre_ids', [])})
+        except (TypeError, ValueError):
+            return jsonify({'message': 'user_ids and genre_ids must be integers'}), 400
+        
+        if not user_ids or not genre_ids:
+            return jsonify({'message': 'user_ids and genre_ids are required'}), 400
+        
+        unknown = [genre_id for genre_id in genre_ids if not await current_app.genre_cache.genre_name(genre_id)]
+        if unknown:
+            return jsonify({'message': 'Unknown genres', 'genre_ids': unknown}), 400
+        
+        batch_size = current_app.config['BULK_ASSIGN_BATCH_SIZE']
+        try:
+            async with current_app.db_pool.connection() as conn:
+                rows = [(user_id, genre_id) for user_id in user_ids for genre_id in genre_ids]
+                for i in range(0, len(rows), batch_size):
+                    await conn.executemany(
+                        'INSERT IGNORE INTO user_genres (user_id, genre_id) VALUES (%s, %s)',
+                        rows[i:i + batch_size]
+                    )
+                
+                # Users who now have enough genres count as having selected them
+                for i in range(0, len(user_ids), batch_size):
+                    chunk = user_ids[i:i + batch_size]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    await conn.execute(f'''
+                        UPDATE users SET has_selected_genres = TRUE
+                        WHERE id IN ({placeholders})
+                        AND (SELECT COUNT(*) FROM user_genres ug WHERE ug.user_id = users.id) >= 3
+                    ''', chunk)
+                
+                await conn.commit()
+            
+            await asyncio.to_thread(current_app.journal.write_many, 'user_genres', user_ids)
+            
+            return jsonify({
+                'message': 'Genres assigned successfully',
+                'user_count': len(user_ids),
+                'genre_count': len(genre_ids)
+            })
+        except aiomysql.Error as e:
+            print(f"Database error while bulk assigning genres: {str(e)}")
+            return jsonify({'message': 'Error assigning genres'}), 400
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing bulk genre assignment request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@genres_bp.route('/add', methods=['POST'])
+@token_required
+@rate_limit('add_genre')
+async def add_genre(current_user):
+    try:
+        data = await request.get_json()
+        if not data or 'name' not in data:
+            return jsonify({'message': 'Genre name is required'}), 400
+        
+        genre_name = data['name'].strip()
+        if not genre_name:
+            return jsonify({'message': 'Genre name cannot be empty'}), 400
+        
+        try:
+            async with current_app.db_pool.connection() as conn:
+                existing_genre = await conn.fetchone('SELECT id FROM genres WHERE name = %s', (genre_name,))
+                
+                if existing_genre:
+                    return jsonify({'message': 'Genre already exists'}), 409
+                
+                await conn.execute('INSERT INTO genres (name) VALUES (%s)', (genre_name,))
+                genre_id = conn.lastrowid
+                
+                await conn.execute(
+                    'INSERT INTO user_genres (user_id, genre_id) VALUES (%s, %s)',
+                    (current_user, genre_id)
+                )
+                await conn.commit()
+            
+            await asyncio.to_thread(current_app.journal.write, 'genres', genre_id)
+            await asyncio.to_thread(current_app.journal.write, 'user_genres', current_user)
+            return jsonify({
+                'message': 'Genre added successfully',
+                'genre': {
+                    'id': genre_id,
+                    'name': genre_name
+                }
+            }), 201
+        
+        except aiomysql.Error as e:
+            print(f"Database error while adding genre: {str(e)}")
+            return jsonify({'message': 'Error adding genre'}), 500
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing add genre request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@genres_bp.route('/status', methods=['GET'])
+@token_required
+async def get_genre_selection_status(current_user):
+    try:
+        cache = current_app.genre_cache
+        etag = make_etag('status', current_app.change_log.boot_id, current_user, await cache.status_generation(current_user))
+        return not_modified(etag) or etagged_json({
+            'has_selected_genres': await cache.has_selected_genres(current_user)
+        }, etag)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error fetching genre selection status: {str(e)}")
+        return jsonify({'message': 'Error fetching status'}), 500
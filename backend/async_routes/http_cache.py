@@ -0,0 +1,48 @@
+from quart import Response, jsonify, request
+from quart.wrappers.response import DataBody
+from services.compression import choose_encoding, is_compressible, matching_etag, variant_etag
+import gzip
+
+
+# Quart versions of services.http_cache.not_modified / etagged_json
+def not_modified(etag):
+    matched = matching_etag(etag, request.if_none_match)
+    if matched is not None:
+        response = Response('', 304)
+        response.set_etag(matched)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+
+def etagged_json(data, etag):
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Quart version of services.compression.compress_response
+async def compress_response(response, accept_encodings, min_size, level=6):
+    if (
+        response.status_code != 200
+        or not isinstance(response.response, DataBody)
+        or 'Content-Encoding' in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+    
+    data = await response.get_data()
+    if len(data) < min_size:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if not choose_encoding(accept_encodings, ('gzip',)):
+        return response
+    
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(variant_etag(etag, 'gzip'), weak)
+    return response
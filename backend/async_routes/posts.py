@@ -0,0 +1,399 @@
+from quart import Blueprint, Response, request, jsonify, current_app
+from async_routes.auth import rate_limit, token_required
+from async_routes.http_cache import etagged_json, not_modified
+from routes.posts import (
+    FEED_SORTS, NDJSON_MIMETYPE, decode_cursor, encode_cursor, encode_views, feed_batches,
+    feed_envelope, feed_headers, post_view, post_views, wants_stream
+)
+from services.db_pool import PoolTimeout
+from services.http_cache import make_etag
+from services.vote_ledger import VOTE_VALUES, counter_deltas
+import asyncio
+from datetime import datetime
+
+# Async twin of routes/posts.py for the ASGI app. Index, ranking and
+# counter work stays inline (in memory); post-store, vote ledger, comment
+# store and journal calls touch files, so they run on worker threads.
+posts_bp = Blueprint('posts', __name__)
+
+def to_thread(fn, *args):
+    return asyncio.to_thread(fn, *args)
+
+def app_object():
+    # The shared route helpers take the app explicitly off the event loop
+    return current_app._get_current_object()
+
+async def stream_feed(posts, current_user, next_cursor, version, ndjson, app):
+    # routes.posts.stream_feed, building each batch of views on a thread
+    head, tail = feed_envelope(next_cursor, version, ndjson)
+    yield head
+    for i, batch in enumerate(feed_batches(posts, app.config['FEED_STREAM_BATCH'])):
+        views = await to_thread(post_views, batch, current_user, app)
+        yield encode_views(views, ndjson, i == 0)
+    yield tail
+
+@posts_bp.route('', methods=['POST'])
+@token_required
+@rate_limit('create_post')
+async def create_post(current_user):
+    try:
+        data = await request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        post_text = data.get('post_text')
+        genre_id = data.get('genre_id')
+        
+        if not all([post_text, genre_id]):
+            return jsonify({'message': 'Missing required fields'}), 400
+        if not isinstance(post_text, str):
+            return jsonify({'message': 'Post text must be a string'}), 400
+        
+        try:
+            genre_name = await current_app.genre_cache.genre_name(genre_id)
+            
+            if not genre_name:
+                return jsonify({'message': 'Invalid genre'}), 400
+            
+            app = app_object()
+            post_data = {
+                'id': app.id_generator.next_id(),
+                'user_id': current_user,
+                'post_text': post_text,
+                'genre_id': genre_id,
+                'genre_name': genre_name,
+                'created_at': datetime.utcnow().isoformat(),
+                'up_vote_count': 0,
+                'down_vote_count': 0,
+                'share_count': 0
+            }
+            
+            await to_thread(app.post_store.create, post_data)
+            await to_thread(app.journal.write, 'post_created', post_data['id'], post_data)
+            
+            return jsonify(await to_thread(post_view, post_data, current_user, app)), 201
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error creating post: {str(e)}")
+            return jsonify({'message': 'Error creating post'}), 500
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing post creation request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('', methods=['GET'])
+@token_required
+async def get_posts(current_user):
+    try:
+        try:
+            sort = request.args.get('sort', 'new')
+            if sort not in FEED_SORTS:
+                raise ValueError(sort)
+            limit = int(request.args.get('limit', current_app.config['FEED_PAGE_SIZE']))
+            before = request.args.get('before')
+            before = decode_cursor(before, sort) if before else None
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid pagination parameters'}), 400
+        
+        limit = max(1, min(limit, current_app.config['FEED_MAX_PAGE_SIZE']))
+        
+        try:
+            app = app_object()
+            user_genres = await app.genre_cache.user_genre_ids(current_user)
+            
+            change_log = app.change_log
+            version = change_log.token()
+            mimetype = wants_stream(request)
+            etag = make_etag(
+                'posts', change_log.boot_id, current_user,
+                await app.genre_cache.user_generation(current_user),
+                change_log.genre_versions(user_genres),
+                sort, limit, before, mimetype
+            )
+            response = not_modified(etag)
+            if response is not None:
+                return response
+            
+            if sort == 'new' and app.timelines is not None:
+                posts = app.timelines.feed(current_user, user_genres, before=before, limit=limit + 1)
+                keys = [(post['created_at'], post['id']) for post in posts]
+            elif sort == 'new':
+                posts = list(app.post_index.feed(user_genres, before=before, limit=limit + 1))
+                keys = [(post['created_at'], post['id']) for post in posts]
+            else:
+                keys = app.ranking.top(sort, user_genres, before=before, limit=limit + 1)
+                posts = [app.post_index.get(post_id) for _, post_id in keys]
+            
+            next_cursor = None
+            if len(posts) > limit:
+                posts = posts[:limit]
+                next_cursor = encode_cursor(keys[limit - 1])
+            
+            if mimetype:
+                body = stream_feed(posts, current_user, next_cursor, version, mimetype == NDJSON_MIMETYPE, app)
+                return Response(body, mimetype=mimetype, headers=feed_headers(etag, next_cursor, version))
+            
+            return etagged_json({
+                'posts': await to_thread(post_views, posts, current_user, app),
+                'next_cursor': next_cursor,
+                'version': version
+            }, etag)
+        
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error fetching posts: {str(e)}")
+            return jsonify({'message': 'Error fetching posts'}), 500
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing get posts request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/search', methods=['GET'])
+@token_required
+async def search_posts(current_user):
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'message': 'Search query is required'}), 400
+        
+        try:
+            genre_id = request.args.get('genre_id')
+            genre_id = int(genre_id) if genre_id else None
+            limit = int(request.args.get('limit', current_app.config['FEED_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'message': 'Invalid search parameters'}), 400
+        
+        limit = max(1, min(limit, current_app.config['FEED_MAX_PAGE_SIZE']))
+        
+        try:
+            app = app_object()
+            results = app.search_index.search(query, genre_id=genre_id, limit=limit)
+            posts = []
+            scores = []
+            for score, post_id in results:
+                post = app.post_index.get(post_id)
+                if post is not None:
+                    posts.append(post)
+                    scores.append(score)
+            
+            views = await to_thread(post_views, posts, current_user, app)
+            for view, score in zip(views, scores):
+                view['score'] = round(score, 4)
+            
+            return jsonify({'posts': views})
+        except Exception as e:
+            print(f"Error searching posts: {str(e)}")
+            return jsonify({'message': 'Error searching posts'}), 500
+    
+    except Exception as e:
+        print(f"Error processing search request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/changes', methods=['GET'])
+@token_required
+async def get_post_changes(current_user):
+    try:
+        try:
+            app = app_object()
+            user_genres = await app.genre_cache.user_genre_ids(current_user)
+            since = app.change_log.parse_token(request.args.get('since'))
+            if since is not None and since > app.change_log.version:
+                await to_thread(app.journal.catch_up)
+            change_log = app.change_log
+            changes = change_log.changes_since(since, user_genres) if since is not None else None
+            
+            if changes is None:
+                return jsonify({
+                    'reset': True,
+                    'posts': [],
+                    'version': change_log.token()
+                })
+            
+            post_ids, version = changes
+            posts = [post for post in map(app.post_index.get, post_ids) if post is not None]
+            return jsonify({
+                'reset': False,
+                'posts': await to_thread(post_views, posts, current_user, app),
+                'version': change_log.token(version)
+            })
+        
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error fetching post changes: {str(e)}")
+            return jsonify({'message': 'Error fetching post changes'}), 500
+    
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing post changes request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/stream', methods=['GET'])
+@token_required
+async def stream_posts(current_user):
+    # Each open stream is a suspended coroutine here, not a parked thread
+    try:
+        user_genres = await current_app.genre_cache.user_genre_ids(current_user)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error opening post stream: {str(e)}")
+        return jsonify({'message': 'Error opening post stream'}), 500
+    
+    bus = current_app.event_bus
+    subscription = bus.subscribe_async(user_genres)
+    body = bus.stream_async(
+        subscription,
+        heartbeat=current_app.config['STREAM_HEARTBEAT'],
+        hello={'version': current_app.change_log.token()}
+    )
+    response = Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Streams stay open indefinitely; don't apply RESPONSE_TIMEOUT
+    response.timeout = None
+    return response
+
+@posts_bp.route('/<post_id>/vote', methods=['POST'])
+@token_required
+@rate_limit('vote_post')
+async def vote_post(current_user, post_id):
+    try:
+        data = await request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        vote_type = data.get('vote_type')
+        
+        if vote_type not in VOTE_VALUES:
+            return jsonify({'message': 'Invalid vote type'}), 400
+        
+        app = app_object()
+        post = app.post_index.get(post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        try:
+            vote = VOTE_VALUES[vote_type]
+            old_vote = await to_thread(app.vote_ledger.cast, current_user, post_id, vote)
+            deltas = counter_deltas(old_vote, vote)
+            for field, amount in deltas.items():
+                app.counters.add(post_id, field, amount)
+            if deltas:
+                await to_thread(app.journal.write, 'post_updated', post_id)
+            
+            return jsonify(await to_thread(post_view, post, current_user, app))
+        except Exception as e:
+            print(f"Error updating vote count: {str(e)}")
+            return jsonify({'message': 'Error updating vote count'}), 500
+    
+    except Exception as e:
+        print(f"Error processing vote request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/<post_id>/share', methods=['POST'])
+@token_required
+@rate_limit('share_post')
+async def share_post(current_user, post_id):
+    try:
+        app = app_object()
+        post = app.post_index.get(post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        try:
+            app.counters.add(post_id, 'share_count')
+            await to_thread(app.journal.write, 'post_updated', post_id)
+            
+            return jsonify(await to_thread(post_view, post, current_user, app))
+        except Exception as e:
+            print(f"Error updating share count: {str(e)}")
+            return jsonify({'message': 'Error updating share count'}), 500
+    
+    except Exception as e:
+        print(f"Error processing share request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/<post_id>/comments', methods=['POST'])
+@token_required
+@rate_limit('create_comment')
+async def create_comment(current_user, post_id):
+    try:
+        data = await request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        comment_text = data.get('comment_text') or ''
+        if not isinstance(comment_text, str):
+            return jsonify({'message': 'Comment text must be a string'}), 400
+        comment_text = comment_text.strip()
+        if not comment_text:
+            return jsonify({'message': 'Comment text is required'}), 400
+        
+        app = app_object()
+        post = app.post_index.get(post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        try:
+            comment = {
+                'id': app.id_generator.next_id(),
+                'post_id': post_id,
+                'user_id': current_user,
+                'comment_text': comment_text,
+                'created_at': datetime.utcnow().isoformat()
+            }
+            await to_thread(app.comment_store.add, comment)
+            await to_thread(app.journal.write, 'comment_created', post_id, comment)
+            
+            return jsonify(comment), 201
+        except Exception as e:
+            print(f"Error creating comment: {str(e)}")
+            return jsonify({'message': 'Error creating comment'}), 500
+    
+    except Exception as e:
+        print(f"Error processing comment creation request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/<post_id>/comments', methods=['GET'])
+@token_required
+async def get_comments(current_user, post_id):
+    try:
+        try:
+            limit = int(request.args.get('limit', current_app.config['COMMENTS_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'message': 'Invalid pagination parameters'}), 400
+        
+        limit = max(1, min(limit, current_app.config['FEED_MAX_PAGE_SIZE']))
+        cursor = request.args.get('cursor')
+        
+        app = app_object()
+        if app.post_index.get(post_id) is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        try:
+            comments = await to_thread(app.comment_store.list, post_id, cursor, limit + 1)
+            next_cursor = None
+            if len(comments) > limit:
+                comments = comments[:limit]
+                next_cursor = comments[-1]['id']
+            
+            return jsonify({
+                'comments': comments,
+                'next_cursor': next_cursor
+            })
+        except Exception as e:
+            print(f"Error fetching comments: {str(e)}")
+            return jsonify({'message': 'Error fetching comments'}), 500
+    
+    except Exception as e:
+        print(f"Error processing get comments request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
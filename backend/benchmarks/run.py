@@ -0,0 +1,245 @@
+"""Load-test the API against seeded throwaway data.
+
+For each corpus size this seeds users, genres and posts (MySQL replaced
+by a SQLite file, posts in the configured store), builds the app with
+create_app() and drives every scenario from several threads through
+Flask test clients. Results are printed as JSON so runs can be diffed:
+
+    cd backend
+    python -m benchmarks.run --sizes 1000,10000,100000 --output before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+from app import create_app
+from benchmarks.seed import WORDS, generate_posts, make_token, seed_database, seed_posts
+from benchmarks.sqlite_mysql import create_database
+from config import Config
+from services.post_store import create_post_store
+
+
+# name -> request(ctx, rng) returning (method, url, json body)
+SCENARIOS = {
+    'feed_new': lambda ctx, rng: ('GET', '/posts?sort=new', None),
+    'feed_new_page2': lambda ctx, rng: ('GET', f'/posts?sort=new&before={ctx["cursors"]["new"]}', None),
+    'feed_hot': lambda ctx, rng: ('GET', '/posts?sort=hot', None),
+    'feed_top': lambda ctx, rng: ('GET', '/posts?sort=top', None),
+    'genres': lambda ctx, rng: ('GET', '/genres', None),
+    'user_genres': lambda ctx, rng: ('GET', '/genres/user', None),
+    'search': lambda ctx, rng: ('GET', f'/posts/search?q={"+".join(rng.sample(WORDS, 2))}', None),
+    'vote': lambda ctx, rng: (
+        'POST', f'/posts/{rng.choice(ctx["post_ids"])}/vote',
+        {'vote_type': rng.choice(('up', 'down', 'none'))}
+    ),
+    'share': lambda ctx, rng: ('POST', f'/posts/{rng.choice(ctx["post_ids"])}/share', None),
+    'comments': lambda ctx, rng: ('GET', f'/posts/{rng.choice(ctx["post_ids"])}/comments', None),
+    'create_comment': lambda ctx, rng: (
+        'POST', f'/posts/{rng.choice(ctx["post_ids"])}/comments',
+        {'comment_text': ' '.join(rng.choices(WORDS, k=12))}
+    ),
+    'create_post': lambda ctx, rng: (
+        'POST', '/posts',
+        {'genre_id': rng.randint(1, 13), 'post_text': ' '.join(rng.choices(WORDS, k=30))}
+    )
+}
+
+
+def make_config(data_dir, store, pool_size, timelines=False):
+    class BenchmarkConfig(Config):
+        DATA_DIR = data_dir
+        POSTS_DIR = os.path.join(data_dir, 'posts')
+        POSTS_DB = os.path.join(data_dir, 'posts.db')
+        POST_STORE = store
+        VOTES_DB = os.path.join(data_dir, 'votes.db')
+        COMMENTS_DB = os.path.join(data_dir, 'comments.db')
+        RATE_LIMIT_DB = os.path.join(data_dir, 'rate_limits.db')
+        WORKER_IDS_DB = os.path.join(data_dir, 'worker_ids.db')
+        JOURNAL_DB = os.path.join(data_dir, 'journal.db')
+        SEARCH_INDEX_PATH = None
+        # Measure the endpoints, not the throttle
+        RATE_LIMITS = {}
+        PASSWORD_HASH_WORKERS = 0
+        MYSQL_POOL_SIZE = pool_size
+        FEED_TIMELINES = timelines
+    return BenchmarkConfig
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_scenario(app, ctx, request, requests, threads, seed):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_thread = max(1, requests // threads)
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        client = app.test_client()
+        local_latencies = []
+        local_errors = 0
+        for _ in range(per_thread):
+            headers = {'Authorization': f'Bearer {rng.choice(ctx["tokens"])}'}
+            method, url, body = request(ctx, rng)
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=body, headers=headers)
+            response.get_data()
+            local_latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else None
+    }
+
+
+def run_size(posts, args, scenarios):
+    rng = random.Random(args.seed)
+    data_dir = tempfile.mkdtemp(prefix='blog-bench-')
+    try:
+        config_class = make_config(data_dir, args.store, max(args.threads, 10), args.timelines)
+        os.makedirs(config_class.POSTS_DIR, exist_ok=True)
+
+        started = time.perf_counter()
+        connect = create_database(os.path.join(data_dir, 'mysql.db'))
+        user_genres = seed_database(connect, args.users, rng)
+        user_ids = list(user_genres)
+
+        # Seed posts straight into the store before the app loads its index
+        store = create_post_store({
+            'POST_STORE': config_class.POST_STORE,
+            'POSTS_DIR': config_class.POSTS_DIR,
+            'POSTS_DB': config_class.POSTS_DB,
+            'POST_ENCODING': config_class.POST_ENCODING
+        })
+        seed_posts(store, generate_posts(posts, user_ids, rng))
+        store.close()
+        seed_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        app = create_app(config_class, connect_db=connect)
+        startup_seconds = time.perf_counter() - started
+
+        try:
+            tokens = [make_token(app.config, user_id) for user_id in rng.sample(user_ids, min(len(user_ids), 200))]
+            client = app.test_client()
+            first_page = client.get('/posts?sort=new', headers={'Authorization': f'Bearer {tokens[0]}'}).get_json()
+            ctx = {
+                'tokens': tokens,
+                'post_ids': [post['id'] for post in app.post_index.all()],
+                'cursors': {'new': quote(first_page.get('next_cursor') or '')}
+            }
+
+            results = {}
+            for name in scenarios:
+                print(f'  {posts} posts: {name}', file=sys.stderr)
+                # Warm caches and code paths before measuring
+                run_scenario(app, ctx, SCENARIOS[name], args.threads, args.threads, args.seed)
+                results[name] = run_scenario(app, ctx, SCENARIOS[name], args.requests, args.threads, args.seed)
+        finally:
+            app.counters.stop()
+            app.vote_ledger.close()
+            app.comment_store.close()
+            app.post_store.close()
+            app.db_pool.close()
+
+        return {
+            'posts': posts,
+            'seed_seconds': round(seed_seconds, 3),
+            'startup_seconds': round(startup_seconds, 3),
+            'endpoints': results
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated post counts')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per scenario')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--store', choices=('json', 'sqlite'), default=Config.POST_STORE)
+    parser.add_argument('--timelines', action='store_true', help='serve new feeds from per-user timelines')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenario names')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(unknown)}')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'store': args.store,
+            'timelines': args.timelines,
+            'users': args.users,
+            'requests': args.requests,
+            'threads': args.threads,
+            'seed': args.seed
+        },
+        'runs': [run_size(int(size), args, scenarios) for size in args.sizes.split(',') if size]
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import bcrypt
+import jwt
+
+from services.id_generator import IdGenerator
+
+DEFAULT_GENRES = [
+    'Technology', 'Science', 'Arts', 'Literature',
+    'Music', 'Travel', 'Food', 'Sports', 'Gaming',
+    'Movies', 'Politics', 'Health', 'Education'
+]
+
+# Small fixed vocabulary so search queries hit a realistic share of posts
+WORDS = (
+    'the quick brown fox jumps over lazy dog while reading about science '
+    'music travel food sports gaming movies politics health education '
+    'technology arts literature python flask mysql server client cache '
+    'index query vote share comment feed genre post user data fast slow'
+).split()
+
+
+def seed_database(connect, users, rng, genre_names=DEFAULT_GENRES, genres_per_user=3):
+    # Returns {user_id: [genre_id, ...]}
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO genres (name) VALUES (%s)', [(name,) for name in genre_names])
+
+    # One cheap hash shared by every user; logins are not what's measured
+    password = bcrypt.hashpw(b'benchmark', bcrypt.gensalt(4)).decode('utf-8')
+    cursor.executemany(
+        'INSERT INTO users (id, username, email, password, has_selected_genres) VALUES (%s, %s, %s, %s, TRUE)',
+        [(user_id, f'user{user_id}', f'user{user_id}@example.com', password)
+         for user_id in range(1, users + 1)]
+    )
+
+    genre_ids = list(range(1, len(genre_names) + 1))
+    user_genres = {
+        user_id: sorted(rng.sample(genre_ids, genres_per_user))
+        for user_id in range(1, users + 1)
+    }
+    cursor.executemany(
+        'INSERT INTO user_genres (user_id, genre_id) VALUES (%s, %s)',
+        [(user_id, genre_id) for user_id, ids in user_genres.items() for genre_id in ids]
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return user_genres
+
+
+def generate_posts(count, user_ids, rng, genre_names=DEFAULT_GENRES, days=30):
+    id_generator = IdGenerator(0)
+    now = datetime.utcnow()
+    for _ in range(count):
+        genre_id = rng.randint(1, len(genre_names))
+        up_votes = int(rng.paretovariate(1.5)) - 1
+        yield {
+            'id': id_generator.next_id(),
+            'user_id': rng.choice(user_ids),
+            'post_text': ' '.join(rng.choices(WORDS, k=rng.randint(10, 60))),
+            'genre_id': genre_id,
+            'genre_name': genre_names[genre_id - 1],
+            'created_at': (now - timedelta(seconds=rng.uniform(0, days * 86400))).isoformat(),
+            'up_vote_count': up_votes,
+            'down_vote_count': rng.randint(0, up_votes // 4 + 1),
+            'share_count': rng.randint(0, up_votes // 10 + 1)
+        }
+
+
+def seed_posts(store, posts, batch_size=1000):
+    batch = []
+    count = 0
+    for post in posts:
+        batch.append(post)
+        if len(batch) >= batch_size:
+            store.create_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        store.create_many(batch)
+        count += len(batch)
+    return count
+
+
+def make_token(config, user_id):
+    # Same claims routes.auth issues on login
+    return jwt.encode({
+        'user_id': user_id,
+        'exp': datetime.utcnow() + timedelta(seconds=config['JWT_ACCESS_TOKEN_EXPIRES'])
+    }, config['JWT_SECRET_KEY'])
@@ -0,0 +1,118 @@
+import functools
+import re
+import sqlite3
+
+import mysql.connector
+
+# The tables the MySQL migrations create, in SQLite dialect
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        has_selected_genres BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS genres (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS user_genres (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        genre_id INTEGER NOT NULL REFERENCES genres(id),
+        UNIQUE (user_id, genre_id)
+    );
+'''
+
+
+@functools.lru_cache(maxsize=256)
+def _translate(sql):
+    sql = sql.replace('%s', '?')
+    return re.sub(r'\bINSERT\s+IGNORE\b', 'INSERT OR IGNORE', sql, flags=re.I)
+
+
+def _mysql_error(e):
+    if isinstance(e, sqlite3.IntegrityError):
+        return mysql.connector.IntegrityError(msg=str(e))
+    return mysql.connector.Error(msg=str(e))
+
+
+class Cursor:
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, operation, params=()):
+        try:
+            self._cursor.execute(_translate(operation), params or ())
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    def executemany(self, operation, seq_params):
+        try:
+            self._cursor.executemany(_translate(operation), seq_params)
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    """Just enough of a mysql.connector connection over a SQLite file.
+
+    Translates %s placeholders and INSERT IGNORE, returns dict rows for
+    cursor(dictionary=True) and raises mysql.connector's exceptions, so
+    the routes run unchanged.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self._conn.execute('SELECT 1')
+
+    def close(self):
+        self._conn.close()
+
+
+def create_database(path):
+    # Returns a connect() factory for create_app(connect_db=...)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    conn.close()
+    return functools.partial(Connection, path)
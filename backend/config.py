@@ -9,15 +9,123 @@ class Config:
     MYSQL_USER = os.getenv('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', '')
     MYSQL_DB = os.getenv('MYSQL_DB', 'blog_app')
+    MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 10))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', 5))
+    # Apply pending schema migrations at startup; with AUTO_MIGRATE=0 the
+    # app refuses to start until `python migrate.py` has been run
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', '1').lower() in ('1', 'true', 'yes')
     
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = 24 * 60 * 60  # 24 hours
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
     
-    # Posts JSON Storage
-    POSTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'posts')
+    # Password hashing (bcrypt runs on a separate process pool)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 30))
+    
+    # Posts Storage
+    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+    POSTS_DIR = os.path.join(DATA_DIR, 'posts')
+    # 'json' keeps one file per post in POSTS_DIR, 'sqlite' keeps all posts in POSTS_DB
+    POST_STORE = os.getenv('POST_STORE', 'json')
+    POSTS_DB = os.getenv('POSTS_DB', os.path.join(DATA_DIR, 'posts.db'))
+    # How new posts are serialized: 'json' (minified) or 'msgpack' (needs
+    # the msgpack package); existing posts are read in either encoding
+    POST_ENCODING = os.getenv('POST_ENCODING', 'json')
+    
+    # Worker ids (0-1023) embedded in post ids must differ between processes
+    # sharing a post store. Each process leases one from WORKER_IDS_DB,
+    # starting at POST_ID_WORKER_ID; give each host its own range.
+    POST_ID_WORKER_ID = int(os.getenv('POST_ID_WORKER_ID', 0))
+    WORKER_IDS_DB = os.getenv('WORKER_IDS_DB', os.path.join(DATA_DIR, 'worker_ids.db'))
+    
+    # Comments live in their own store; feed items carry a short preview
+    COMMENTS_DB = os.getenv('COMMENTS_DB', os.path.join(DATA_DIR, 'comments.db'))
+    COMMENTS_PAGE_SIZE = 20
+    FEED_COMMENT_PREVIEW = 3
+    
+    # Per-user vote ledger
+    VOTES_DB = os.getenv('VOTES_DB', os.path.join(DATA_DIR, 'votes.db'))
+    
+    # Users allowed to call admin endpoints such as /genres/bulk-assign
+    ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+    BULK_ASSIGN_BATCH_SIZE = 1000
+    
+    # Genre catalog and per-user genre selection cache
+    GENRE_CACHE_TTL = int(os.getenv('GENRE_CACHE_TTL', 300))
+    GENRE_CACHE_MAX_USERS = int(os.getenv('GENRE_CACHE_MAX_USERS', 10000))
+    
+    # Vote/share counters are buffered in memory and flushed in batches
+    COUNTER_SHARDS = 16
+    COUNTER_FLUSH_INTERVAL = float(os.getenv('COUNTER_FLUSH_INTERVAL', 1.0))
+    
+    # Recent post changes kept for GET /posts/changes
+    CHANGE_LOG_SIZE = 10000
+    
+    # Writes are journaled in JOURNAL_DB, which every worker process polls
+    # every JOURNAL_POLL_INTERVAL seconds to pick up the others' writes
+    JOURNAL_DB = os.getenv('JOURNAL_DB', os.path.join(DATA_DIR, 'journal.db'))
+    JOURNAL_SIZE = int(os.getenv('JOURNAL_SIZE', 100000))
+    JOURNAL_POLL_INTERVAL = float(os.getenv('JOURNAL_POLL_INTERVAL', 0.25))
+    
+    # Live updates over GET /posts/stream
+    STREAM_QUEUE_SIZE = 100
+    STREAM_HEARTBEAT = 15
+    
+    # Full-text search; set SEARCH_INDEX_PATH to persist the index across restarts
+    SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH')
+    
+    # Ranked feeds (GET /posts?sort=hot|top): a share counts as this many
+    # upvotes, and every HOT_SCORE_PERIOD seconds of age costs 10x the votes
+    RANKING_SHARE_WEIGHT = 2
+    HOT_SCORE_PERIOD = 45000
+    
+    # Feed pagination
+    FEED_PAGE_SIZE = 20
+    FEED_MAX_PAGE_SIZE = 100
+    # Posts serialized per chunk when GET /posts streams its response
+    FEED_STREAM_BATCH = 20
+    
+    # Materialized 'new' feeds (FEED_TIMELINES=1): the newest TIMELINE_SIZE
+    # post ids per recently active user, up to TIMELINE_MAX_USERS users,
+    # filled as posts are created. Genres with more than
+    # TIMELINE_FANOUT_LIMIT such followers are merged in at read time.
+    FEED_TIMELINES = os.getenv('FEED_TIMELINES', '').lower() in ('1', 'true', 'yes')
+    TIMELINE_SIZE = int(os.getenv('TIMELINE_SIZE', 500))
+    TIMELINE_MAX_USERS = int(os.getenv('TIMELINE_MAX_USERS', 10000))
+    TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', 1000))
+    
+    # Responses at least this large are gzipped for clients that accept it;
+    # the served frontend is compressed once at startup instead
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = 6
+    
+    # Serve frontend/ from this server too (SERVE_FRONTEND=1). Assets get
+    # content-hashed URLs that are cached for STATIC_MAX_AGE seconds.
+    SERVE_FRONTEND = os.getenv('SERVE_FRONTEND', '').lower() in ('1', 'true', 'yes')
+    FRONTEND_DIR = os.getenv('FRONTEND_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend'))
+    STATIC_MAX_AGE = 365 * 24 * 60 * 60
+    
+    # Token-bucket limits per endpoint as (requests per second, burst), keyed
+    # by user id, or by client IP for signup/login. 'memory' keeps buckets
+    # per process; 'sqlite' shares them between workers through RATE_LIMIT_DB.
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', os.path.join(DATA_DIR, 'rate_limits.db'))
+    RATE_LIMITS = {
+        'create_post': (0.2, 10),
+        'create_comment': (0.5, 20),
+        'vote_post': (2, 60),
+        'share_post': (1, 30),
+        'add_genre': (0.05, 5),
+        'signup': (0.05, 5),
+        'login': (0.2, 10)
+    }
     
     @staticmethod
     def init_app(app):
-        # Create posts directory if it doesn't exist
-        os.makedirs(Config.POSTS_DIR, exist_ok=True) 
\ No newline at end of file
+        # Create data and posts directories if they don't exist
+        os.makedirs(app.config['DATA_DIR'], exist_ok=True)
+        os.makedirs(app.config['POSTS_DIR'], exist_ok=True) 
\ No newline at end of file
@@ -0,0 +1,39 @@
+import os
+from app import prepare_for_fork, reset_after_fork
+
+# Production launcher: gunicorn -c gunicorn.conf.py (from backend/)
+#
+# The app is built once in the master, so schema setup runs once and the
+# first workers start from the master's post index, ranking and search
+# index. Workers forked later (after a crash or timeout, or on HUP)
+# rebuild them from the stores.
+#
+# Each worker keeps posts, counts and change versions in memory and
+# applies every write, its own and the other workers', from the shared
+# journal (JOURNAL_DB), polled every JOURNAL_POLL_INTERVAL seconds.
+# `kill -HUP <master pid>` replaces the workers gracefully from the same
+# preloaded app; to pick up new code, send USR2 (starts a new master)
+# and then QUIT to the old one. Old and new workers share the journal.
+#
+# MYSQL_POOL_SIZE applies per worker.
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+
+# Threaded workers: an open /posts/stream holds one thread
+worker_class = 'gthread'
+threads = int(os.getenv('WORKER_THREADS', 8))
+
+preload_app = True
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+
+
+def when_ready(server):
+    # The app is loaded and no worker has been forked yet
+    prepare_for_fork(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    # Ages count spawns from 1, so the first `workers` are forked at boot
+    reset_after_fork(worker.app.wsgi(), reload=worker.age > server.num_workers)
@@ -0,0 +1,42 @@
+import argparse
+from config import Config
+from app import connect_mysql, run_migrations
+from services.migrations import LATEST_VERSION, MIGRATIONS, schema_version
+import mysql.connector
+
+# Applies pending schema migrations, e.g. before starting new code with
+# AUTO_MIGRATE=0:
+#   python migrate.py            # apply pending migrations
+#   python migrate.py --status   # show the current and latest version
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending database migrations')
+    parser.add_argument('--status', action='store_true', help='only report the schema version')
+    args = parser.parse_args()
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    
+    if args.status:
+        try:
+            conn = connect_mysql(config)
+            try:
+                version = schema_version(conn)
+            finally:
+                conn.close()
+        except mysql.connector.Error as err:
+            print(f"Error reading schema version: {err}")
+            raise SystemExit(1)
+        
+        print(f"Schema version {version} of {LATEST_VERSION}")
+        for number, description, _ in MIGRATIONS:
+            if number > version:
+                print(f"  pending {number}: {description}")
+        return
+    
+    applied = run_migrations(config)
+    if applied:
+        print(f"Applied migrations {', '.join(map(str, applied))}; schema is at version {LATEST_VERSION}")
+    else:
+        print(f"Schema is up to date (version {LATEST_VERSION})")
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify, current_app
-import bcrypt
 import jwt
 import mysql.connector
 from datetime import datetime, timedelta
 from functools import wraps
+from services.db_pool import PoolTimeout
+from services.password_hasher import HasherBusy
+from services.rate_limiter import rate_limit
+import hashlib
+import time
 
 auth_bp = Blueprint('auth', __name__)
 
+def busy_response():
+    return jsonify({'message': 'Server is busy, please try again'}), 503, {'Retry-After': '1'}
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -17,8 +24,14 @@ def token_required(f):
         
         try:
             token = token.split('Bearer ')[1]
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            current_user = data['user_id']
+            # Tokens already verified by this process skip jwt.decode
+            digest = hashlib.sha256(token.encode('utf-8')).digest()
+            current_user = current_app.token_cache.get(digest)
+            if current_user is None:
+                data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+                current_user = data['user_id']
+                # Never let a cached entry outlive the token itself
+                current_app.token_cache.set(digest, current_user, ttl=data['exp'] - time.time())
         except:
             return jsonify({'message': 'Token is invalid'}), 401
         
@@ -27,6 +40,7 @@ def token_required(f):
     return decorated
 
 @auth_bp.route('/signup', methods=['POST'])
+@rate_limit('signup', per='ip')
 def signup():
     try:
         data = request.get_json()
@@ -41,8 +55,11 @@ def signup():
         if not all([username, email, password]):
             return jsonify({'message': 'Missing required fields'}), 400
         
-        # Hash password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        # Hash password on the bcrypt worker pool
+        try:
+            hashed_password = current_app.password_hasher.hash(password)
+        except HasherBusy:
+            return busy_response()
         
         conn = current_app.get_db()
         cursor = conn.cursor(dictionary=True)
@@ -72,6 +89,8 @@ def signup():
             
         except mysql.connector.IntegrityError as e:
             return jsonify({'message': 'Username or email already exists'}), 409
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error during signup: {str(e)}")
             return jsonify({'message': 'An error occurred during signup'}), 500
@@ -79,11 +98,14 @@ def signup():
             cursor.close()
             conn.close()
             
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error processing signup request: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', per='ip')
 def login():
     try:
         data = request.get_json()
@@ -104,7 +126,19 @@ def login():
             cursor.execute('SELECT * FROM users WHERE username = %s', (username,))
             user = cursor.fetchone()
             
-            if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+            if user and current_app.password_hasher.verify(password, user['password']):
+                # Upgrade hashes made with an outdated bcrypt cost; best
+                # effort, the login succeeds either way
+                if current_app.password_hasher.needs_rehash(user['password']):
+                    try:
+                        cursor.execute(
+                            'UPDATE users SET password = %s WHERE id = %s',
+                            (current_app.password_hasher.hash(password), user['id'])
+                        )
+                        conn.commit()
+                    except Exception as e:
+                        print(f"Error upgrading password hash for user {user['id']}: {str(e)}")
+                
                 token = jwt.encode({
                     'user_id': user['id'],
                     'exp': datetime.utcnow() + timedelta(seconds=current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
@@ -118,6 +152,10 @@ def login():
             else:
                 return jsonify({'message': 'Invalid username or password'}), 401
                 
+        except HasherBusy:
+            return busy_response()
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error during login: {str(e)}")
             return jsonify({'message': 'An error occurred during login'}), 500
@@ -125,6 +163,8 @@ def login():
             cursor.close()
             conn.close()
             
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error processing login request: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500 
\ No newline at end of file
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
 from routes.auth import token_required
+from services.db_pool import PoolTimeout
+from services.http_cache import etagged_json, make_etag, not_modified
+from services.rate_limiter import rate_limit
 import mysql.connector
 
 genres_bp = Blueprint('genres', __name__)
@@ -7,41 +10,31 @@ genres_bp = Blueprint('genres', __name__)
 @genres_bp.route('', methods=['GET'])
 @token_required
 def get_genres(current_user):
-    conn = current_app.get_db()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute('SELECT * FROM genres ORDER BY name')
-        genres = cursor.fetchall()
-        return jsonify(genres)
+        cache = current_app.genre_cache
+        etag = make_etag('genres', current_app.change_log.boot_id, cache.catalog_generation())
+        return not_modified(etag) or etagged_json(cache.genres(), etag)
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching genres: {str(e)}")
         return jsonify({'message': 'Error fetching genres'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @genres_bp.route('/user', methods=['GET'])
 @token_required
 def get_user_genres(current_user):
-    conn = current_app.get_db()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute('''
-            SELECT g.* FROM genres g
-            JOIN user_genres ug ON g.id = ug.genre_id
-            WHERE ug.user_id = %s
-            ORDER BY g.name
-        ''', (current_user,))
-        genres = cursor.fetchall()
-        return jsonify(genres)
+        cache = current_app.genre_cache
+        etag = make_etag(
+            'user_genres', current_app.change_log.boot_id, current_user,
+            cache.catalog_generation(), cache.user_generation(current_user)
+        )
+        return not_modified(etag) or etagged_json(cache.user_genres(current_user), etag)
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching user genres: {str(e)}")
         return jsonify({'message': 'Error fetching user genres'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @genres_bp.route('/user', methods=['POST'])
 @token_required
@@ -51,7 +44,10 @@ def set_user_genres(current_user):
         if not data:
             return jsonify({'message': 'No data provided'}), 400
             
-        genre_ids = data.get('genre_ids', [])
+        try:
+            genre_ids = {int(genre_id) for genre_id in data.get('genre_ids', [])}
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid genre selection'}), 400
         
         if len(genre_ids) < 3:
             return jsonify({'message': 'Please select at least 3 genres'}), 400
@@ -60,14 +56,23 @@ def set_user_genres(current_user):
         cursor = conn.cursor()
         
         try:
-            # Delete existing user genres
-            cursor.execute('DELETE FROM user_genres WHERE user_id = %s', (current_user,))
+            # Only touch the rows that actually change
+            cursor.execute('SELECT genre_id FROM user_genres WHERE user_id = %s', (current_user,))
+            current_ids = {row[0] for row in cursor.fetchall()}
+            removed = sorted(current_ids - genre_ids)
+            added = sorted(genre_ids - current_ids)
             
-            # Insert new user genres
-            for genre_id in genre_ids:
+            if removed:
+                placeholders = ', '.join(['%s'] * len(removed))
                 cursor.execute(
+                    f'DELETE FROM user_genres WHERE user_id = %s AND genre_id IN ({placeholders})',
+                    (current_user, *removed)
+                )
+            
+            if added:
+                cursor.executemany(
                     'INSERT INTO user_genres (user_id, genre_id) VALUES (%s, %s)',
-                    (current_user, genre_id)
+                    [(current_user, genre_id) for genre_id in added]
                 )
             
             # Update user's genre selection status
@@ -77,6 +82,8 @@ def set_user_genres(current_user):
             )
             
             conn.commit()
+            # Drop the cached genres in every worker
+            current_app.journal.write('user_genres', current_user)
             return jsonify({'message': 'User genres updated successfully'})
         except mysql.connector.Error as e:
             conn.rollback()
@@ -86,12 +93,84 @@ def set_user_genres(current_user):
             cursor.close()
             conn.close()
             
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error processing genre update request: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
 
+@genres_bp.route('/bulk-assign', methods=['POST'])
+@token_required
+def bulk_assign_genres(current_user):
+    # Admin only: add the same genres to a whole cohort of users at once
+    if current_user not in current_app.config['ADMIN_USER_IDS']:
+        return jsonify({'message': 'Admin access required'}), 403
+    
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        try:
+            user_ids = sorted({int(user_id) for user_id in data.get('user_ids', [])})
+            genre_ids = sorted({int(genre_id) for genre_id in data.get('genre_ids', [])})
+        except (TypeError, ValueError):
+            return jsonify({'message': 'user_ids and genre_ids must be integers'}), 400
+        
+        if not user_ids or not genre_ids:
+            return jsonify({'message': 'user_ids and genre_ids are required'}), 400
+        
+        unknown = [genre_id for genre_id in genre_ids if not current_app.genre_cache.genre_name(genre_id)]
+        if unknown:
+            return jsonify({'message': 'Unknown genres', 'genre_ids': unknown}), 400
+        
+        batch_size = current_app.config['BULK_ASSIGN_BATCH_SIZE']
+        conn = current_app.get_db()
+        cursor = conn.cursor()
+        
+        try:
+            rows = [(user_id, genre_id) for user_id in user_ids for genre_id in genre_ids]
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(
+                    'INSERT IGNORE INTO user_genres (user_id, genre_id) VALUES (%s, %s)',
+                    rows[i:i + batch_size]
+                )
+            
+            # Users who now have enough genres count as having selected them
+            for i in range(0, len(user_ids), batch_size):
+                chunk = user_ids[i:i + batch_size]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'''
+                    UPDATE users SET has_selected_genres = TRUE
+                    WHERE id IN ({placeholders})
+                    AND (SELECT COUNT(*) FROM user_genres ug WHERE ug.user_id = users.id) >= 3
+                ''', chunk)
+            
+            conn.commit()
+            current_app.journal.write_many('user_genres', user_ids)
+            
+            return jsonify({
+                'message': 'Genres assigned successfully',
+                'user_count': len(user_ids),
+                'genre_count': len(genre_ids)
+            })
+        except mysql.connector.Error as e:
+            conn.rollback()
+            print(f"Database error while bulk assigning genres: {str(e)}")
+            return jsonify({'message': 'Error assigning genres'}), 400
+        finally:
+            cursor.close()
+            conn.close()
+            
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing bulk genre assignment request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
 @genres_bp.route('/add', methods=['POST'])
 @token_required
+@rate_limit('add_genre')
 def add_genre(current_user):
     try:
         data = request.get_json()
@@ -124,6 +203,8 @@ def add_genre(current_user):
             )
             
             conn.commit()
+            current_app.journal.write('genres', genre_id)
+            current_app.journal.write('user_genres', current_user)
             return jsonify({
                 'message': 'Genre added successfully',
                 'genre': {
@@ -140,6 +221,8 @@ def add_genre(current_user):
             cursor.close()
             conn.close()
             
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error processing add genre request: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
@@ -147,21 +230,14 @@ def add_genre(current_user):
 @genres_bp.route('/status', methods=['GET'])
 @token_required
 def get_genre_selection_status(current_user):
-    conn = current_app.get_db()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute(
-            'SELECT has_selected_genres FROM users WHERE id = %s',
-            (current_user,)
-        )
-        result = cursor.fetchone()
-        return jsonify({
-            'has_selected_genres': bool(result['has_selected_genres'])
-        })
+        cache = current_app.genre_cache
+        etag = make_etag('status', current_app.change_log.boot_id, current_user, cache.status_generation(current_user))
+        return not_modified(etag) or etagged_json({
+            'has_selected_genres': cache.has_selected_genres(current_user)
+        }, etag)
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error fetching genre selection status: {str(e)}")
-        return jsonify({'message': 'Error fetching status'}), 500
-    finally:
-        cursor.close()
-        conn.close() 
\ No newline at end of file
+        return jsonify({'message': 'Error fetching status'}), 500 
\ No newline at end of file
@@ -1,20 +1,148 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from routes.auth import token_required
+from services.counters import COUNTER_FIELDS
+from services.db_pool import PoolTimeout
+from services.http_cache import etagged_json, make_etag, not_modified
+from services.rate_limiter import rate_limit
+from services.vote_ledger import VOTE_NAMES, VOTE_VALUES, counter_deltas
+import base64
 import json
-import os
-import time
 from datetime import datetime
 
 posts_bp = Blueprint('posts', __name__)
 
-def get_post_file_path(post_id):
-    return os.path.join(current_app.config['POSTS_DIR'], f'{post_id}.json')
-
 def generate_post_id():
-    return str(int(time.time() * 1000))
+    return current_app.id_generator.next_id()
+
+FEED_SORTS = ('new', 'hot', 'top')
+
+# Opaque feed cursor: the sort key of the last post on a page, i.e.
+# (created_at, id) for 'new' and (score, id) for the ranked sorts
+def encode_cursor(key):
+    raw = json.dumps(list(key), separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, sort='new'):
+    value, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return (str(value) if sort == 'new' else float(value), str(post_id))
+
+# Posts as returned to the caller: current counts, the caller's own vote
+# and a comment summary (count plus the first few comments). `app` is for
+# callers outside a Flask app context (the ASGI routes).
+def post_views(posts, current_user, app=None):
+    app = app or current_app
+    post_ids = [post['id'] for post in posts]
+    user_votes = app.vote_ledger.votes_for(current_user, post_ids)
+    summaries = app.comment_store.summaries(post_ids, app.config['FEED_COMMENT_PREVIEW'])
+    views = []
+    for post in posts:
+        post = app.counters.merged(post)
+        comment_count, comments = summaries.get(post['id'], (0, []))
+        views.append(dict(
+            post,
+            my_vote=VOTE_NAMES.get(user_votes.get(post['id'])),
+            comment_count=comment_count,
+            comments=comments
+        ))
+    return views
+
+def post_view(post, current_user, app=None):
+    return post_views([post], current_user, app)[0]
+
+# Bump the post's genre version so ETags and delta fetches see the change,
+# rescore it, and push the new state to stream subscribers of that genre
+def record_change(post, event_type='post_updated', extra=None, app=None, seq=None):
+    app = app or current_app
+    version = app.change_log.record(post['genre_id'], post['id'], seq)
+    merged = app.counters.merged(post)
+    app.ranking.update(merged)
+    data = dict(merged, **(extra or {}))
+    data['version'] = app.change_log.token(version)
+    app.event_bus.publish(post['genre_id'], event_type, data)
+
+# Applies one journal entry to this process's in-memory state. Routes
+# write to the stores, then to the journal, and every process (the
+# writer included) applies the entry here; see services/journal.py.
+def apply_journal_entry(app, seq, kind, key, data):
+    if kind == 'user_genres':
+        app.genre_cache.invalidate_user(int(key))
+        if app.timelines is not None:
+            app.timelines.invalidate(int(key))
+        return
+    if kind == 'genres':
+        app.genre_cache.invalidate_catalog()
+        return
+    
+    if kind == 'post_created' and app.post_index.get(key) is None:
+        app.post_index.add(data)
+        if app.timelines is not None:
+            app.timelines.push(data)
+    elif kind == 'counters':
+        # Flushed by some process; the store has everyone's deltas
+        stored = app.post_store.get(key)
+        if stored is not None:
+            app.post_index.set_counters(key, {field: stored.get(field, 0) for field in COUNTER_FIELDS})
+    
+    post = app.post_index.get(key)
+    if post is None:
+        return
+    if kind == 'post_created':
+        app.search_index.add(post)
+    event_type = 'post_updated' if kind == 'counters' else kind
+    extra = {'comment': data} if kind == 'comment_created' else None
+    record_change(post, event_type, extra, app=app, seq=seq)
+
+# Streamed feed bodies (GET /posts?stream=1, or Accept: application/x-ndjson):
+# views are built and serialized a batch at a time instead of as one list
+# and one JSON string. The JSON form has the same shape as the buffered
+# response; NDJSON is one post per line, with the cursor and version in
+# the X-Next-Cursor and X-Feed-Version headers.
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_stream(req):
+    if req.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return NDJSON_MIMETYPE
+    if req.args.get('stream') in ('1', 'true'):
+        return 'application/json'
+    return None
+
+def feed_batches(posts, batch_size):
+    for i in range(0, len(posts), batch_size):
+        yield posts[i:i + batch_size]
+
+def encode_views(views, ndjson, first):
+    items = [json.dumps(view, separators=(',', ':')) for view in views]
+    if ndjson:
+        return ''.join(item + '\n' for item in items)
+    return ('' if first else ',') + ','.join(items)
+
+def feed_envelope(next_cursor, version, ndjson):
+    # Text before and after the posts
+    if ndjson:
+        return '', ''
+    tail = json.dumps({'next_cursor': next_cursor, 'version': version}, separators=(',', ':'))
+    return '{"posts":[', '],' + tail[1:]
+
+def stream_feed(posts, current_user, next_cursor, version, ndjson, app):
+    head, tail = feed_envelope(next_cursor, version, ndjson)
+    yield head
+    for i, batch in enumerate(feed_batches(posts, app.config['FEED_STREAM_BATCH'])):
+        yield encode_views(post_views(batch, current_user, app), ndjson, i == 0)
+    yield tail
+
+def feed_headers(etag, next_cursor, version):
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'private, no-cache',
+        'X-Feed-Version': version
+    }
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return headers
 
 @posts_bp.route('', methods=['POST'])
 @token_required
+@rate_limit('create_post')
 def create_post(current_user):
     try:
         data = request.get_json()
@@ -26,16 +154,14 @@ def create_post(current_user):
         
         if not all([post_text, genre_id]):
             return jsonify({'message': 'Missing required fields'}), 400
-        
-        # Get genre name
-        conn = current_app.get_db()
-        cursor = conn.cursor(dictionary=True)
+        if not isinstance(post_text, str):
+            return jsonify({'message': 'Post text must be a string'}), 400
         
         try:
-            cursor.execute('SELECT name FROM genres WHERE id = %s', (genre_id,))
-            genre = cursor.fetchone()
+            # Get genre name
+            genre_name = current_app.genre_cache.genre_name(genre_id)
             
-            if not genre:
+            if not genre_name:
                 return jsonify({'message': 'Invalid genre'}), 400
             
             # Create post
@@ -45,27 +171,26 @@ def create_post(current_user):
                 'user_id': current_user,
                 'post_text': post_text,
                 'genre_id': genre_id,
-                'genre_name': genre['name'],
+                'genre_name': genre_name,
                 'created_at': datetime.utcnow().isoformat(),
                 'up_vote_count': 0,
                 'down_vote_count': 0,
-                'share_count': 0,
-                'comments': []
+                'share_count': 0
             }
             
-            # Save post to JSON file
-            post_file = get_post_file_path(post_id)
-            with open(post_file, 'w') as f:
-                json.dump(post_data, f, indent=2)
+            # Save post to the configured store, then index it in every worker
+            current_app.post_store.create(post_data)
+            current_app.journal.write('post_created', post_id, post_data)
             
-            return jsonify(post_data), 201
+            return jsonify(post_view(post_data, current_user)), 201
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error creating post: {str(e)}")
             return jsonify({'message': 'Error creating post'}), 500
-        finally:
-            cursor.close()
-            conn.close()
             
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error processing post creation request: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
@@ -74,51 +199,192 @@ def create_post(current_user):
 @token_required
 def get_posts(current_user):
     try:
-        # Get user's genre preferences
-        conn = current_app.get_db()
-        cursor = conn.cursor()
+        try:
+            sort = request.args.get('sort', 'new')
+            if sort not in FEED_SORTS:
+                raise ValueError(sort)
+            limit = int(request.args.get('limit', current_app.config['FEED_PAGE_SIZE']))
+            before = request.args.get('before')
+            before = decode_cursor(before, sort) if before else None
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid pagination parameters'}), 400
+        
+        limit = max(1, min(limit, current_app.config['FEED_MAX_PAGE_SIZE']))
         
         try:
-            cursor.execute(
-                'SELECT genre_id FROM user_genres WHERE user_id = %s',
-                (current_user,)
+            # Get user's genre preferences
+            user_genres = current_app.genre_cache.user_genre_ids(current_user)
+            
+            # Unchanged genres (and subscriptions) mean an unchanged page
+            change_log = current_app.change_log
+            version = change_log.token()
+            mimetype = wants_stream(request)
+            etag = make_etag(
+                'posts', change_log.boot_id, current_user,
+                current_app.genre_cache.user_generation(current_user),
+                change_log.genre_versions(user_genres),
+                sort, limit, before, mimetype
             )
-            user_genres = [row[0] for row in cursor.fetchall()]
+            response = not_modified(etag)
+            if response is not None:
+                return response
             
-            # Get all posts from JSON files
-            posts = []
-            posts_dir = current_app.config['POSTS_DIR']
-            
-            if os.path.exists(posts_dir):
-                for filename in os.listdir(posts_dir):
-                    if filename.endswith('.json'):
-                        try:
-                            with open(os.path.join(posts_dir, filename)) as f:
-                                post = json.load(f)
-                                # Only include posts from user's preferred genres
-                                if int(post['genre_id']) in user_genres:
-                                    posts.append(post)
-                        except Exception as e:
-                            print(f"Error reading post file {filename}: {str(e)}")
-                            continue
-            
-            # Sort posts by creation date (newest first)
-            posts.sort(key=lambda x: x['created_at'], reverse=True)
-            return jsonify(posts)
+            # Merge the user's genres from the in-memory index or timeline
+            # (newest first) or the ranking (highest score first), fetching
+            # one extra post to learn whether another page exists
+            if sort == 'new' and current_app.timelines is not None:
+                posts = current_app.timelines.feed(current_user, user_genres, before=before, limit=limit + 1)
+                keys = [(post['created_at'], post['id']) for post in posts]
+            elif sort == 'new':
+                posts = list(current_app.post_index.feed(user_genres, before=before, limit=limit + 1))
+                keys = [(post['created_at'], post['id']) for post in posts]
+            else:
+                keys = current_app.ranking.top(sort, user_genres, before=before, limit=limit + 1)
+                posts = [current_app.post_index.get(post_id) for _, post_id in keys]
+            
+            next_cursor = None
+            if len(posts) > limit:
+                posts = posts[:limit]
+                next_cursor = encode_cursor(keys[limit - 1])
+            
+            if mimetype:
+                # The generator runs after this request's context is gone
+                body = stream_feed(
+                    posts, current_user, next_cursor, version,
+                    mimetype == NDJSON_MIMETYPE, current_app._get_current_object()
+                )
+                return Response(body, mimetype=mimetype, headers=feed_headers(etag, next_cursor, version))
             
+            return etagged_json({
+                'posts': post_views(posts, current_user),
+                'next_cursor': next_cursor,
+                'version': version
+            }, etag)
+            
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error fetching posts: {str(e)}")
             return jsonify({'message': 'Error fetching posts'}), 500
-        finally:
-            cursor.close()
-            conn.close()
             
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error processing get posts request: {str(e)}")
         return jsonify({'message': 'Internal server error'}), 500
 
+@posts_bp.route('/search', methods=['GET'])
+@token_required
+def search_posts(current_user):
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'message': 'Search query is required'}), 400
+        
+        try:
+            genre_id = request.args.get('genre_id')
+            genre_id = int(genre_id) if genre_id else None
+            limit = int(request.args.get('limit', current_app.config['FEED_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'message': 'Invalid search parameters'}), 400
+        
+        limit = max(1, min(limit, current_app.config['FEED_MAX_PAGE_SIZE']))
+        
+        try:
+            results = current_app.search_index.search(query, genre_id=genre_id, limit=limit)
+            posts = []
+            scores = []
+            for score, post_id in results:
+                post = current_app.post_index.get(post_id)
+                if post is not None:
+                    posts.append(post)
+                    scores.append(score)
+            
+            views = post_views(posts, current_user)
+            for view, score in zip(views, scores):
+                view['score'] = round(score, 4)
+            
+            return jsonify({'posts': views})
+        except Exception as e:
+            print(f"Error searching posts: {str(e)}")
+            return jsonify({'message': 'Error searching posts'}), 500
+            
+    except Exception as e:
+        print(f"Error processing search request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/changes', methods=['GET'])
+@token_required
+def get_post_changes(current_user):
+    # Posts in the caller's genres created or changed since `since` (the
+    # version returned by GET /posts or a previous call, by any worker). A
+    # reset response means the version is too old; refetch the feed.
+    try:
+        try:
+            user_genres = current_app.genre_cache.user_genre_ids(current_user)
+            since = current_app.change_log.parse_token(request.args.get('since'))
+            if since is not None and since > current_app.change_log.version:
+                # Issued by a worker further along the journal
+                current_app.journal.catch_up()
+            change_log = current_app.change_log
+            changes = change_log.changes_since(since, user_genres) if since is not None else None
+            
+            if changes is None:
+                return jsonify({
+                    'reset': True,
+                    'posts': [],
+                    'version': change_log.token()
+                })
+            
+            post_ids, version = changes
+            posts = [post for post in map(current_app.post_index.get, post_ids) if post is not None]
+            return jsonify({
+                'reset': False,
+                'posts': post_views(posts, current_user),
+                'version': change_log.token(version)
+            })
+            
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error fetching post changes: {str(e)}")
+            return jsonify({'message': 'Error fetching post changes'}), 500
+            
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error processing post changes request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/stream', methods=['GET'])
+@token_required
+def stream_posts(current_user):
+    # Server-sent events for new posts, counter changes and comments in the
+    # caller's genres. A 'dropped' event means the client fell behind and
+    # should reconnect and resync through /posts/changes.
+    try:
+        user_genres = current_app.genre_cache.user_genre_ids(current_user)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error opening post stream: {str(e)}")
+        return jsonify({'message': 'Error opening post stream'}), 500
+    
+    bus = current_app.event_bus
+    subscription = bus.subscribe(user_genres)
+    body = bus.stream(
+        subscription,
+        heartbeat=current_app.config['STREAM_HEARTBEAT'],
+        hello={'version': current_app.change_log.token()}
+    )
+    return Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @posts_bp.route('/<post_id>/vote', methods=['POST'])
 @token_required
+@rate_limit('vote_post')
 def vote_post(current_user, post_id):
     try:
         data = request.get_json()
@@ -127,26 +393,24 @@ def vote_post(current_user, post_id):
             
         vote_type = data.get('vote_type')
         
-        if vote_type not in ['up', 'down']:
+        # 'none' retracts the caller's vote; repeating a vote is a no-op
+        if vote_type not in VOTE_VALUES:
             return jsonify({'message': 'Invalid vote type'}), 400
         
-        post_file = get_post_file_path(post_id)
-        if not os.path.exists(post_file):
+        post = current_app.post_index.get(post_id)
+        if post is None:
             return jsonify({'message': 'Post not found'}), 404
         
         try:
-            with open(post_file, 'r+') as f:
-                post = json.load(f)
-                if vote_type == 'up':
-                    post['up_vote_count'] += 1
-                else:
-                    post['down_vote_count'] += 1
-                
-                f.seek(0)
-                json.dump(post, f, indent=2)
-                f.truncate()
-            
-            return jsonify(post)
+            vote = VOTE_VALUES[vote_type]
+            old_vote = current_app.vote_ledger.cast(current_user, post_id, vote)
+            deltas = counter_deltas(old_vote, vote)
+            for field, amount in deltas.items():
+                current_app.counters.add(post_id, field, amount)
+            if deltas:
+                current_app.journal.write('post_updated', post_id)
+            
+            return jsonify(post_view(post, current_user))
         except Exception as e:
             print(f"Error updating vote count: {str(e)}")
             return jsonify({'message': 'Error updating vote count'}), 500
@@ -157,26 +421,97 @@ def vote_post(current_user, post_id):
 
 @posts_bp.route('/<post_id>/share', methods=['POST'])
 @token_required
+@rate_limit('share_post')
 def share_post(current_user, post_id):
     try:
-        post_file = get_post_file_path(post_id)
-        if not os.path.exists(post_file):
+        post = current_app.post_index.get(post_id)
+        if post is None:
             return jsonify({'message': 'Post not found'}), 404
         
         try:
-            with open(post_file, 'r+') as f:
-                post = json.load(f)
-                post['share_count'] += 1
-                
-                f.seek(0)
-                json.dump(post, f, indent=2)
-                f.truncate()
-            
-            return jsonify(post)
+            current_app.counters.add(post_id, 'share_count')
+            current_app.journal.write('post_updated', post_id)
+            
+            return jsonify(post_view(post, current_user))
         except Exception as e:
             print(f"Error updating share count: {str(e)}")
             return jsonify({'message': 'Error updating share count'}), 500
             
     except Exception as e:
         print(f"Error processing share request: {str(e)}")
-        return jsonify({'message': 'Internal server error'}), 500 
\ No newline at end of file
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/<post_id>/comments', methods=['POST'])
+@token_required
+@rate_limit('create_comment')
+def create_comment(current_user, post_id):
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'message': 'No data provided'}), 400
+        
+        comment_text = data.get('comment_text') or ''
+        if not isinstance(comment_text, str):
+            return jsonify({'message': 'Comment text must be a string'}), 400
+        comment_text = comment_text.strip()
+        if not comment_text:
+            return jsonify({'message': 'Comment text is required'}), 400
+        
+        post = current_app.post_index.get(post_id)
+        if post is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        try:
+            comment = {
+                'id': current_app.id_generator.next_id(),
+                'post_id': post_id,
+                'user_id': current_user,
+                'comment_text': comment_text,
+                'created_at': datetime.utcnow().isoformat()
+            }
+            current_app.comment_store.add(comment)
+            current_app.journal.write('comment_created', post_id, comment)
+            
+            return jsonify(comment), 201
+        except Exception as e:
+            print(f"Error creating comment: {str(e)}")
+            return jsonify({'message': 'Error creating comment'}), 500
+            
+    except Exception as e:
+        print(f"Error processing comment creation request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
+
+@posts_bp.route('/<post_id>/comments', methods=['GET'])
+@token_required
+def get_comments(current_user, post_id):
+    try:
+        try:
+            limit = int(request.args.get('limit', current_app.config['COMMENTS_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'message': 'Invalid pagination parameters'}), 400
+        
+        limit = max(1, min(limit, current_app.config['FEED_MAX_PAGE_SIZE']))
+        # The cursor is the id of the last comment already seen
+        cursor = request.args.get('cursor')
+        
+        if current_app.post_index.get(post_id) is None:
+            return jsonify({'message': 'Post not found'}), 404
+        
+        try:
+            comments = current_app.comment_store.list(post_id, after=cursor, limit=limit + 1)
+            next_cursor = None
+            if len(comments) > limit:
+                comments = comments[:limit]
+                next_cursor = comments[-1]['id']
+            
+            return jsonify({
+                'comments': comments,
+                'next_cursor': next_cursor
+            })
+        except Exception as e:
+            print(f"Error fetching comments: {str(e)}")
+            return jsonify({'message': 'Error fetching comments'}), 500
+            
+    except Exception as e:
+        print(f"Error processing get comments request: {str(e)}")
+        return jsonify({'message': 'Internal server error'}), 500
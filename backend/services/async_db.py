@@ -0,0 +1,116 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+
+from services.db_pool import PoolTimeout
+
+
+class AsyncConnection:
+    """A checked-out aiomysql connection with one-call query helpers.
+
+    Each helper opens a cursor, runs one statement and reports its
+    duration to `on_query`, like TimedCursor does for the sync pool.
+    """
+
+    def __init__(self, conn, on_query=None):
+        self._conn = conn
+        self._on_query = on_query
+        self.lastrowid = None
+        self.rowcount = 0
+
+    async def _run(self, operation, call, dictionary=False):
+        started = time.perf_counter()
+        try:
+            async with self._conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cursor:
+                result = await call(cursor)
+                self.lastrowid = cursor.lastrowid
+                self.rowcount = cursor.rowcount
+                return result
+        finally:
+            if self._on_query is not None:
+                self._on_query(operation, time.perf_counter() - started)
+
+    async def execute(self, operation, params=()):
+        return await self._run(operation, lambda cursor: cursor.execute(operation, params))
+
+    async def executemany(self, operation, seq_params):
+        return await self._run(operation, lambda cursor: cursor.executemany(operation, seq_params))
+
+    async def fetchone(self, operation, params=(), dictionary=True):
+        async def call(cursor):
+            await cursor.execute(operation, params)
+            return await cursor.fetchone()
+        return await self._run(operation, call, dictionary)
+
+    async def fetchall(self, operation, params=(), dictionary=True):
+        async def call(cursor):
+            await cursor.execute(operation, params)
+            return await cursor.fetchall()
+        return await self._run(operation, call, dictionary)
+
+    async def commit(self):
+        await self._conn.commit()
+
+    async def rollback(self):
+        await self._conn.rollback()
+
+
+class AsyncConnectionPool:
+    """aiomysql pool with the same bound and checkout timeout as ConnectionPool.
+
+    open() must be awaited on the serving event loop before first use.
+    Connections are rolled back on return, so an uncommitted transaction
+    never leaks into the next checkout.
+    """
+
+    def __init__(self, host, user, password, db, size=10, timeout=5.0, on_query=None, on_wait=None):
+        self._options = {'host': host, 'user': user, 'password': password, 'db': db}
+        self.size = size
+        self.timeout = timeout
+        self._on_query = on_query
+        self._on_wait = on_wait
+        self._pool = None
+
+    async def open(self):
+        if self._pool is None:
+            self._pool = await aiomysql.create_pool(
+                minsize=0, maxsize=self.size, autocommit=False, pool_recycle=3600, **self._options
+            )
+
+    @asynccontextmanager
+    async def connection(self):
+        started = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f'No database connection available after {self.timeout}s')
+        if self._on_wait is not None:
+            self._on_wait(time.perf_counter() - started)
+        try:
+            yield AsyncConnection(conn, self._on_query)
+        finally:
+            try:
+                await conn.rollback()
+            except Exception:
+                # Broken connection; the pool drops closed ones on release
+                conn.close()
+            self._pool.release(conn)
+
+    async def fetchone(self, operation, params=(), dictionary=True):
+        async with self.connection() as conn:
+            return await conn.fetchone(operation, params, dictionary)
+
+    async def fetchall(self, operation, params=(), dictionary=True):
+        async with self.connection() as conn:
+            return await conn.fetchall(operation, params, dictionary)
+
+    def stats(self):
+        return {'size': self.size, 'idle': self._pool.freesize if self._pool is not None else 0}
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
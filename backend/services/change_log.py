@@ -0,0 +1,80 @@
+import threading
+import uuid
+from collections import deque
+
+
+class ChangeLog:
+    """Per-genre version counters plus a bounded log of changed posts.
+
+    Every post mutation (create, vote, share, comment) takes the next
+    sequence number, which becomes the version of the post's genre. The
+    versions back ETags on the feed, and the log answers "what changed
+    since version N" for delta fetches.
+
+    Sequence numbers are local unless the caller passes its own, such as
+    the shared journal's entry numbers along with the journal id as
+    `log_id`. Tokens carry the log id, so one from another log simply
+    reads as "too old". The boot id always names this process.
+    A log started at `start` knows nothing before it; genres it has not
+    seen change report `start` as their version.
+    """
+
+    def __init__(self, size=10000, log_id=None, start=0):
+        self.boot_id = uuid.uuid4().hex[:12]
+        self.log_id = log_id or self.boot_id
+        self._lock = threading.Lock()
+        self._start = start
+        self._seq = start
+        # The log covers changes after this sequence number
+        self._floor = start
+        self._genre_versions = {}
+        self._log = deque(maxlen=size)
+
+    @property
+    def version(self):
+        return self._seq
+
+    def record(self, genre_id, post_id, seq=None):
+        with self._lock:
+            self._seq = self._seq + 1 if seq is None else max(seq, self._seq)
+            if len(self._log) == self._log.maxlen:
+                self._floor = self._log[0][0]
+            self._genre_versions[int(genre_id)] = self._seq
+            self._log.append((self._seq, int(genre_id), post_id))
+            return self._seq
+
+    def genre_versions(self, genre_ids):
+        return tuple(
+            (int(genre_id), self._genre_versions.get(int(genre_id), self._start))
+            for genre_id in sorted(genre_ids, key=int)
+        )
+
+    def token(self, seq=None):
+        return f'{self.log_id}:{self._seq if seq is None else seq}'
+
+    def parse_token(self, token):
+        # Sequence number for a token from this log, else None
+        log_id, _, seq = (token or '').partition(':')
+        if log_id != self.log_id or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def changes_since(self, since, genre_ids):
+        # (changed post ids, newest first, current version), or None when
+        # the log no longer reaches back to `since`
+        genre_ids = {int(genre_id) for genre_id in genre_ids}
+        with self._lock:
+            current = self._seq
+            if since > current:
+                return None
+            if since < self._floor:
+                return None
+            post_ids = []
+            seen = set()
+            for seq, genre_id, post_id in reversed(self._log):
+                if seq <= since:
+                    break
+                if genre_id in genre_ids and post_id not in seen:
+                    seen.add(post_id)
+                    post_ids.append(post_id)
+        return post_ids, current
@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+
+
+class CommentStore:
+    """Comments kept apart from post documents, indexed by (post_id, id).
+
+    Comment ids come from the post IdGenerator, so ordering by id is
+    ordering by creation time.
+    """
+
+    _COLUMNS = 'id, post_id, user_id, comment_text, created_at'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS comments (
+                id TEXT PRIMARY KEY,
+                post_id TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                comment_text TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_comments_post
+            ON comments (post_id, id)
+        ''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def reopen(self):
+        # Forked workers open their own connection
+        with self._lock:
+            self._conn = self._connect()
+
+    def _to_comment(self, row):
+        return dict(zip(('id', 'post_id', 'user_id', 'comment_text', 'created_at'), row))
+
+    def add(self, comment):
+        with self._lock:
+            self._conn.execute(
+                f'INSERT INTO comments ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?)',
+                (comment['id'], comment['post_id'], comment['user_id'],
+                 comment['comment_text'], comment['created_at'])
+            )
+
+    def list(self, post_id, after=None, limit=20):
+        # Oldest first, strictly after the comment id `after`
+        sql = f'SELECT {self._COLUMNS} FROM comments WHERE post_id = ?'
+        params = [post_id]
+        if after:
+            sql += ' AND id > ?'
+            params.append(after)
+        sql += ' ORDER BY id LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_comment(row) for row in rows]
+
+    def summaries(self, post_ids, preview_size):
+        # {post_id: (comment_count, first `preview_size` comments)} for a
+        # page of posts, in two indexed queries however long the threads are
+        if not post_ids:
+            return {}
+        placeholders = ', '.join(['?'] * len(post_ids))
+        with self._lock:
+            counts = self._conn.execute(f'''
+                SELECT post_id, COUNT(*) FROM comments
+                WHERE post_id IN ({placeholders})
+                GROUP BY post_id
+            ''', post_ids).fetchall()
+            previews = self._conn.execute(f'''
+                SELECT {self._COLUMNS} FROM (
+                    SELECT {self._COLUMNS},
+                        ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY id) AS position
+                    FROM comments
+                    WHERE post_id IN ({placeholders})
+                )
+                WHERE position <= ?
+                ORDER BY post_id, id
+            ''', (*post_ids, preview_size)).fetchall() if preview_size else []
+
+        summaries = {post_id: (count, []) for post_id, count in counts}
+        for row in previews:
+            comment = self._to_comment(row)
+            summaries[comment['post_id']][1].append(comment)
+        return summaries
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,83 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip variants are built
+    brotli = None
+
+# Preferred first
+ENCODINGS = ('br', 'gzip')
+
+_COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'image/svg+xml'
+)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in _COMPRESSIBLE_TYPES)
+
+
+def precompress(data, min_size):
+    # {encoding: body} for every encoding that actually saves bytes
+    variants = {}
+    if len(data) < min_size:
+        return variants
+    # mtime=0 keeps the output (and anything derived from it) reproducible
+    variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def choose_encoding(accept_encodings, available):
+    # accept_encodings is the request's Accept-Encoding header as parsed by
+    # werkzeug, which reports 0 for codings the client refuses
+    for encoding in ENCODINGS:
+        if encoding in available and accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def variant_etag(etag, encoding):
+    # A compressed body is a different representation, so it needs its
+    # own strong ETag
+    return f'{etag}-{encoding}'
+
+
+def matching_etag(etag, if_none_match):
+    # The tag in If-None-Match naming `etag` or one of its compressed
+    # variants, or None
+    for candidate in (etag,) + tuple(variant_etag(etag, encoding) for encoding in ENCODINGS):
+        if candidate in if_none_match:
+            return candidate
+    return None
+
+
+def compress_response(response, accept_encodings, min_size, level=6):
+    # On-the-fly gzip for buffered responses; streams are left alone
+    if (
+        response.status_code != 200
+        or response.is_streamed
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not choose_encoding(accept_encodings, ('gzip',)):
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(variant_etag(etag, 'gzip'), weak)
+    return response
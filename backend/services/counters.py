@@ -0,0 +1,104 @@
+import atexit
+import threading
+import zlib
+
+COUNTER_FIELDS = ('up_vote_count', 'down_vote_count', 'share_count')
+
+
+class CounterBuffer:
+    """Sharded in-memory buffer for post vote/share counters.
+
+    Increments land in a per-shard dict under that shard's lock and are
+    flushed to the post store in batches. The post index holds the last
+    flushed counts; readers see those plus whatever is still pending.
+    Deltas the store could not write stay pending and are retried on
+    every flush until they land; the rest of the batch is not held back.
+    `on_flush` is called with the ids of the posts whose counts were written.
+    """
+
+    def __init__(self, store, index, shards=16, flush_interval=1.0, on_flush=None):
+        self.store = store
+        self.index = index
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _shard(self, post_id):
+        return self._shards[zlib.crc32(str(post_id).encode('utf-8')) % len(self._shards)]
+
+    def add(self, post_id, field, amount=1):
+        lock, pending = self._shard(post_id)
+        with lock:
+            deltas = pending.setdefault(post_id, {})
+            deltas[field] = deltas.get(field, 0) + amount
+
+    def merged(self, post):
+        # Flushed counts from the index plus pending increments
+        lock, pending = self._shard(post['id'])
+        with lock:
+            deltas = pending.get(post['id'])
+            if not deltas:
+                return self.index.get(post['id']) or post
+            merged = dict(self.index.get(post['id']) or post)
+            for field, amount in deltas.items():
+                merged[field] = merged.get(field, 0) + amount
+            return merged
+
+    def flush(self):
+        for lock, pending in self._shards:
+            with lock:
+                if not pending:
+                    continue
+                batch = dict(pending)
+                pending.clear()
+                # Move the deltas into the index while readers are locked out,
+                # so the merged view never double counts or drops them
+                for post_id, deltas in batch.items():
+                    self.index.apply_counters(post_id, deltas)
+
+            try:
+                failed = self.store.apply_counters(batch)
+            except Exception as e:
+                print(f"Error flushing counters: {str(e)}")
+                # Nothing in the batch was written
+                failed = batch
+
+            if self.on_flush is not None:
+                written = [post_id for post_id in batch if post_id not in failed]
+                if written:
+                    try:
+                        self.on_flush(written)
+                    except Exception as e:
+                        print(f"Error reporting flushed counters: {str(e)}")
+
+            if not failed:
+                continue
+            with lock:
+                for post_id, deltas in failed.items():
+                    # Take back what the index got ahead of the store, and
+                    # put it back so the next flush retries it
+                    self.index.apply_counters(post_id, {f: -n for f, n in deltas.items()})
+                    merged = pending.setdefault(post_id, {})
+                    for field, amount in deltas.items():
+                        merged[field] = merged.get(field, 0) + amount
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
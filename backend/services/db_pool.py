@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections.
+
+    At most `size` connections are checked out at once; `acquire` waits up
+    to `timeout` seconds for one to be returned. Connections are opened
+    lazily and pinged on checkout so dropped ones are replaced.
+    """
+
+    def __init__(self, connect, size=10, timeout=5.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        # LIFO keeps a hot working set and lets idle extras time out server-side
+        self._idle = queue.LifoQueue()
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f'No database connection available after {self.timeout}s')
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_healthy(conn):
+                    return conn
+                self._close_quietly(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        try:
+            if discard:
+                self._close_quietly(conn)
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {'size': self.size, 'idle': self._idle.qsize()}
+
+    def close(self):
+        while True:
+            try:
+                self._close_quietly(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """Per-request handle on a pooled connection.
+
+    Route code keeps calling close() as before; that is a no-op and the
+    connection goes back to the pool when the app context tears down.
+    If `on_query` is given, cursors report each statement's duration to it.
+    """
+
+    def __init__(self, pool, conn, on_query=None):
+        self._pool = pool
+        self._conn = conn
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._on_query is None:
+            return cursor
+        return TimedCursor(cursor, self._on_query)
+
+    def close(self):
+        pass
+
+    def release(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            # Never hand the next request an open transaction
+            conn.rollback()
+        except Exception:
+            self._pool.release(conn, discard=True)
+            return
+        self._pool.release(conn)
+
+
+class TimedCursor:
+    """Cursor wrapper that times execute() and executemany() round trips."""
+
+    def __init__(self, cursor, on_query):
+        self._cursor = cursor
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(operation, *args, **kwargs)
+        finally:
+            self._on_query(operation, time.perf_counter() - started)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, *args, **kwargs)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import queue
+import threading
+
+# Queued in place of everything else when a subscriber falls behind
+DROPPED = object()
+
+
+class Subscription:
+    def __init__(self, genre_ids, maxsize, notify=None):
+        self.genre_ids = frozenset(int(genre_id) for genre_id in genre_ids)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+        # Called after each message is queued (wakes async streams)
+        self.notify = notify
+
+
+class EventBus:
+    """In-process fan-out of post events to per-subscriber bounded queues.
+
+    Subscribers are indexed by genre, so publishing touches only the
+    subscribers of that genre. Publishing never blocks: a subscriber
+    whose queue is full is dropped and told so, and is expected to
+    reconnect and resync.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        # genre_id -> tuple of subscriptions, replaced on every change so
+        # publishers can read it without taking the lock
+        self._by_genre = {}
+
+    def subscribe(self, genre_ids, notify=None):
+        subscription = Subscription(genre_ids, self.queue_size, notify)
+        with self._lock:
+            for genre_id in subscription.genre_ids:
+                self._by_genre[genre_id] = self._by_genre.get(genre_id, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for genre_id in subscription.genre_ids:
+                remaining = tuple(s for s in self._by_genre.get(genre_id, ()) if s is not subscription)
+                if remaining:
+                    self._by_genre[genre_id] = remaining
+                else:
+                    self._by_genre.pop(genre_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({id(s) for subs in self._by_genre.values() for s in subs})
+
+    def publish(self, genre_id, event_type, data):
+        subscribers = self._by_genre.get(int(genre_id), ())
+        if not subscribers:
+            return
+        # Serialize once for every subscriber
+        message = f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+        for subscription in subscribers:
+            if subscription.dropped:
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                self._drop(subscription)
+                continue
+            if subscription.notify is not None:
+                subscription.notify()
+
+    def _drop(self, subscription):
+        if subscription.dropped:
+            return
+        subscription.dropped = True
+        self.unsubscribe(subscription)
+        # Publishers racing with us may refill the queue; keep draining
+        while True:
+            try:
+                while True:
+                    subscription.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                subscription.queue.put_nowait(DROPPED)
+            except queue.Full:
+                continue
+            if subscription.notify is not None:
+                subscription.notify()
+            return
+
+    def stream(self, subscription, heartbeat=15, hello=None):
+        # SSE body generator; unsubscribes when the client goes away
+        try:
+            yield 'retry: 3000\n\n'
+            if hello is not None:
+                yield f'event: ready\ndata: {json.dumps(hello, separators=(",", ":"))}\n\n'
+            while True:
+                try:
+                    message = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is DROPPED:
+                    yield 'event: dropped\ndata: {}\n\n'
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    def subscribe_async(self, genre_ids):
+        # For async streams: publishers may run on other threads, so the
+        # wakeup is handed to the subscriber's event loop
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # Loop already closed; the stream is gone
+                pass
+
+        subscription = self.subscribe(genre_ids, notify=notify)
+        subscription.wakeup = wakeup
+        return subscription
+
+    async def stream_async(self, subscription, heartbeat=15, hello=None):
+        # stream() for subscribe_async() subscriptions; waits without a thread
+        try:
+            yield 'retry: 3000\n\n'
+            if hello is not None:
+                yield f'event: ready\ndata: {json.dumps(hello, separators=(",", ":"))}\n\n'
+            while True:
+                try:
+                    message = subscription.queue.get_nowait()
+                except queue.Empty:
+                    try:
+                        await asyncio.wait_for(subscription.wakeup.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ': keep-alive\n\n'
+                    # Anything queued before the wakeup is picked up next
+                    subscription.wakeup.clear()
+                    continue
+                if message is DROPPED:
+                    yield 'event: dropped\ndata: {}\n\n'
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,194 @@
+import itertools
+import time
+
+from services.cache import TTLCache
+
+CATALOG_SQL = 'SELECT * FROM genres ORDER BY name'
+USER_GENRES_SQL = 'SELECT genre_id FROM user_genres WHERE user_id = %s'
+USER_STATUS_SQL = 'SELECT has_selected_genres FROM users WHERE id = %s'
+
+
+class GenreCache:
+    """Cached genre catalog and per-user genre selections.
+
+    Entries expire after `ttl` seconds and are invalidated explicitly by
+    the genre write endpoints. Every load from MySQL is stamped with a new
+    generation number, which the genre endpoints use as their ETag.
+    A genre id missing from the catalog may have been added by another
+    worker, so it triggers a reload, but at most one per
+    `miss_reload_interval` seconds: unknown ids can't force a query each.
+    """
+
+    def __init__(self, get_db, ttl=300, max_users=10000, miss_reload_interval=5):
+        self._get_db = get_db
+        self.miss_reload_interval = miss_reload_interval
+        self._generations = itertools.count(1)
+        self._catalog_loaded = 0.0
+        self._catalog = TTLCache(maxsize=1, ttl=ttl)
+        self._user_genres = TTLCache(maxsize=max_users, ttl=ttl)
+        self._user_status = TTLCache(maxsize=max_users, ttl=ttl)
+
+    def _query(self, sql, params=()):
+        conn = self._get_db()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def catalog(self):
+        # (genres ordered by name, {id: name}, generation)
+        catalog = self._catalog.get('catalog')
+        if catalog is None:
+            catalog = self._store_catalog(self._query(CATALOG_SQL))
+        return catalog
+
+    # Loaded rows -> cached entries, shared with AsyncGenreCache
+    def _store_catalog(self, genres):
+        catalog = (genres, {genre['id']: genre['name'] for genre in genres}, next(self._generations))
+        self._catalog.set('catalog', catalog)
+        self._catalog_loaded = time.monotonic()
+        return catalog
+
+    def _reload_on_miss(self):
+        # True if the catalog is old enough to be reloaded for a missing id
+        if time.monotonic() - self._catalog_loaded < self.miss_reload_interval:
+            return False
+        self.invalidate_catalog()
+        return True
+
+    def _store_user_entry(self, user_id, rows):
+        entry = (frozenset(row['genre_id'] for row in rows), next(self._generations))
+        self._user_genres.set(user_id, entry)
+        return entry
+
+    def _store_status_entry(self, user_id, rows):
+        entry = (bool(rows[0]['has_selected_genres']) if rows else False, next(self._generations))
+        self._user_status.set(user_id, entry)
+        return entry
+
+    def catalog_generation(self):
+        return self.catalog()[2]
+
+    def genres(self):
+        return self.catalog()[0]
+
+    def genre_name(self, genre_id):
+        try:
+            genre_id = int(genre_id)
+        except (TypeError, ValueError):
+            return None
+        name = self.catalog()[1].get(genre_id)
+        if name is None and self._reload_on_miss():
+            # Possibly added by another worker since the catalog was cached
+            name = self.catalog()[1].get(genre_id)
+        return name
+
+    def _user_entry(self, user_id):
+        entry = self._user_genres.get(user_id)
+        if entry is None:
+            entry = self._store_user_entry(user_id, self._query(USER_GENRES_SQL, (user_id,)))
+        return entry
+
+    def user_genre_ids(self, user_id):
+        return self._user_entry(user_id)[0]
+
+    def user_generation(self, user_id):
+        return self._user_entry(user_id)[1]
+
+    def user_genres(self, user_id):
+        genre_ids = self.user_genre_ids(user_id)
+        genres = [genre for genre in self.genres() if genre['id'] in genre_ids]
+        if len(genres) < len(genre_ids) and self._reload_on_miss():
+            genres = [genre for genre in self.genres() if genre['id'] in genre_ids]
+        return genres
+
+    def _status_entry(self, user_id):
+        entry = self._user_status.get(user_id)
+        if entry is None:
+            entry = self._store_status_entry(user_id, self._query(USER_STATUS_SQL, (user_id,)))
+        return entry
+
+    def has_selected_genres(self, user_id):
+        return self._status_entry(user_id)[0]
+
+    def status_generation(self, user_id):
+        return self._status_entry(user_id)[1]
+
+    def invalidate_catalog(self):
+        self._catalog.invalidate('catalog')
+
+    def invalidate_user(self, user_id):
+        self._user_genres.invalidate(user_id)
+        self._user_status.invalidate(user_id)
+
+    def stats(self):
+        return {
+            'catalog': self._catalog.stats(),
+            'user_genres': self._user_genres.stats(),
+            'user_status': self._user_status.stats()
+        }
+
+
+class AsyncGenreCache(GenreCache):
+    """GenreCache for the ASGI app: the same cached entries, with coroutine
+    accessors that load misses through an AsyncConnectionPool."""
+
+    def __init__(self, db_pool, ttl=300, max_users=10000, miss_reload_interval=5):
+        super().__init__(None, ttl=ttl, max_users=max_users, miss_reload_interval=miss_reload_interval)
+        self._db_pool = db_pool
+
+    async def catalog(self):
+        catalog = self._catalog.get('catalog')
+        if catalog is None:
+            catalog = self._store_catalog(await self._db_pool.fetchall(CATALOG_SQL))
+        return catalog
+
+    async def catalog_generation(self):
+        return (await self.catalog())[2]
+
+    async def genres(self):
+        return (await self.catalog())[0]
+
+    async def genre_name(self, genre_id):
+        try:
+            genre_id = int(genre_id)
+        except (TypeError, ValueError):
+            return None
+        name = (await self.catalog())[1].get(genre_id)
+        if name is None and self._reload_on_miss():
+            name = (await self.catalog())[1].get(genre_id)
+        return name
+
+    async def _user_entry(self, user_id):
+        entry = self._user_genres.get(user_id)
+        if entry is None:
+            entry = self._store_user_entry(user_id, await self._db_pool.fetchall(USER_GENRES_SQL, (user_id,)))
+        return entry
+
+    async def user_genre_ids(self, user_id):
+        return (await self._user_entry(user_id))[0]
+
+    async def user_generation(self, user_id):
+        return (await self._user_entry(user_id))[1]
+
+    async def user_genres(self, user_id):
+        genre_ids = await self.user_genre_ids(user_id)
+        genres = [genre for genre in await self.genres() if genre['id'] in genre_ids]
+        if len(genres) < len(genre_ids) and self._reload_on_miss():
+            genres = [genre for genre in await self.genres() if genre['id'] in genre_ids]
+        return genres
+
+    async def _status_entry(self, user_id):
+        entry = self._user_status.get(user_id)
+        if entry is None:
+            entry = self._store_status_entry(user_id, await self._db_pool.fetchall(USER_STATUS_SQL, (user_id,)))
+        return entry
+
+    async def has_selected_genres(self, user_id):
+        return (await self._status_entry(user_id))[0]
+
+    async def status_generation(self, user_id):
+        return (await self._status_entry(user_id))[1]
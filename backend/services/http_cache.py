@@ -0,0 +1,29 @@
+import hashlib
+
+from flask import jsonify, make_response, request
+
+from services.compression import matching_etag
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def not_modified(etag):
+    # A 304 response if the client already holds this version, plain or
+    # compressed, else None
+    matched = matching_etag(etag, request.if_none_match)
+    if matched is not None:
+        response = make_response('', 304)
+        response.set_etag(matched)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+
+def etagged_json(data, etag):
+    # Clients may keep the body but must revalidate it on every use
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
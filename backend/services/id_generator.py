@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Crockford base32: digits sort before letters, so string order == numeric order
+_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+TIMESTAMP_BITS = 48
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+ID_LENGTH = 14  # ceil(70 bits / 5)
+
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def encode_id(value):
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode_id(post_id):
+    value = 0
+    for char in post_id:
+        value = value * 32 + _ALPHABET.index(char)
+    return value
+
+
+def id_timestamp_ms(post_id):
+    return decode_id(post_id) >> (WORKER_BITS + SEQUENCE_BITS)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WorkerIdRegistry:
+    """Leases worker ids to the processes on one host through a SQLite file.
+
+    Each process claims the lowest id from `first` up that no live process
+    holds; leases of processes that have exited are taken over. Hosts
+    sharing a post store need disjoint ranges, i.e. different `first`s.
+    """
+
+    def __init__(self, path, first=0):
+        if not 0 <= first <= MAX_WORKER_ID:
+            raise ValueError(f'first worker id must be between 0 and {MAX_WORKER_ID}')
+        self.path = path
+        self.first = first
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS worker_ids (
+                worker_id INTEGER PRIMARY KEY,
+                pid INTEGER NOT NULL
+            )
+        ''')
+        return conn
+
+    def holders(self):
+        # Pids of the other live processes holding an id
+        conn = self._connect()
+        try:
+            pids = {pid for (pid,) in conn.execute('SELECT pid FROM worker_ids')}
+        finally:
+            conn.close()
+        return {pid for pid in pids if pid != os.getpid() and _process_alive(pid)}
+
+    def claim(self):
+        pid = os.getpid()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                taken = {
+                    worker_id
+                    for worker_id, holder in conn.execute('SELECT worker_id, pid FROM worker_ids')
+                    if holder != pid and _process_alive(holder)
+                }
+                worker_id = next(
+                    (i for i in range(self.first, MAX_WORKER_ID + 1) if i not in taken),
+                    None
+                )
+                if worker_id is None:
+                    raise RuntimeError(f'All worker ids from {self.first} to {MAX_WORKER_ID} are in use')
+                conn.execute('DELETE FROM worker_ids WHERE pid = ?', (pid,))
+                conn.execute(
+                    'INSERT OR REPLACE INTO worker_ids (worker_id, pid) VALUES (?, ?)',
+                    (worker_id, pid)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        return worker_id
+
+
+class IdGenerator:
+    """Snowflake-style ids: 48-bit ms timestamp, 10-bit worker, 12-bit sequence.
+
+    Ids are fixed-width base32 strings, so they sort lexicographically in
+    creation order. Up to 4096 ids per millisecond per worker; past that
+    the generator borrows the next millisecond instead of waiting for the
+    clock. Every process making ids needs its own worker id: with a
+    `registry`, each process (forked children included) claims one on
+    first use. A fixed `worker_id` is for single-process tools; such a
+    generator refuses to run in a forked child.
+    """
+
+    def __init__(self, worker_id=None, registry=None):
+        if (worker_id is None) == (registry is None):
+            raise ValueError('IdGenerator needs either a worker_id or a registry')
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'worker_id must be between 0 and {MAX_WORKER_ID}')
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._worker_id = worker_id
+        self._pid = os.getpid()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _current_worker_id(self):
+        # Called under the lock; claims an id in a new process
+        if self._worker_id is None or os.getpid() != self._pid:
+            if self.registry is None:
+                raise RuntimeError('IdGenerator with a fixed worker_id was used in a forked process')
+            self._worker_id = self.registry.claim()
+            self._pid = os.getpid()
+        return self._worker_id
+
+    @property
+    def worker_id(self):
+        with self._lock:
+            return self._current_worker_id()
+
+    def next_id(self):
+        with self._lock:
+            worker_id = self._current_worker_id()
+            # Never step backwards, even if the wall clock does
+            now = max(int(time.time() * 1000), self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Out of sequence numbers: move on to the next
+                    # millisecond now rather than wait for the clock,
+                    # which could take long if it was set back
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            value = (
+                (now << (WORKER_BITS + SEQUENCE_BITS))
+                | (worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+        return encode_id(value)
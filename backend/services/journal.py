@@ -0,0 +1,162 @@
+import json
+import sqlite3
+import threading
+import uuid
+
+
+class Journal:
+    """Shared, ordered log of writes, replayed by every process serving them.
+
+    Posts, counts, change versions and cached genres live in memory per
+    process. A write lands in its store first and is then appended here;
+    each process applies the journal in order, its own entries included,
+    through `apply(seq, kind, key, data)`: right away for its own writes,
+    and by polling every `interval` seconds for everyone else's. Entry
+    numbers are the same in every process, so they double as change
+    versions. Only the newest `size` entries are kept; a process that
+    falls further behind is rebuilt from the stores through
+    `resync(position)` instead.
+    """
+
+    def __init__(self, path, apply, resync, size=100000, interval=0.25):
+        self.path = path
+        self.apply = apply
+        self.resync = resync
+        self.size = size
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Held while applying, so entries are applied once and in order
+        self._apply_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = self._connect()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS journal_meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute(
+            "INSERT OR IGNORE INTO journal_meta (name, value) VALUES ('id', ?), ('floor', '0')",
+            (uuid.uuid4().hex[:12],)
+        )
+        # Tells this journal's versions apart from another's
+        self.id = self._conn.execute("SELECT value FROM journal_meta WHERE name = 'id'").fetchone()[0]
+        # Last entry applied in this process
+        self.position = self.end()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def reopen(self):
+        # A SQLite connection must not be used across fork(); forked
+        # workers open their own
+        with self._lock:
+            self._conn = self._connect()
+
+    def end(self):
+        # Number of the last entry written, 0 if none
+        with self._lock:
+            row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'journal'").fetchone()
+        return row[0] if row else 0
+
+    def write(self, kind, key, data=None):
+        return self.write_many(kind, [key], data)
+
+    def write_many(self, kind, keys, data=None):
+        # Append one entry per key and apply them here before returning
+        if not keys:
+            return self.position
+        data = json.dumps(data, separators=(',', ':')) if data is not None else None
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for key in keys:
+                    seq = self._conn.execute(
+                        'INSERT INTO journal (kind, key, data) VALUES (?, ?, ?)',
+                        (kind, str(key), data)
+                    ).lastrowid
+                # Trim about once per thousand entries
+                if seq // 1000 != (seq - len(keys)) // 1000 and seq > self.size:
+                    self._conn.execute('DELETE FROM journal WHERE seq <= ?', (seq - self.size,))
+                    self._conn.execute(
+                        "UPDATE journal_meta SET value = ? WHERE name = 'floor'",
+                        (str(seq - self.size),)
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        self.catch_up(seq)
+        return seq
+
+    def _read(self, after, limit):
+        # Entries after `after`, or None if some were trimmed already
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                floor = int(self._conn.execute("SELECT value FROM journal_meta WHERE name = 'floor'").fetchone()[0])
+                if after < floor:
+                    return None
+                return self._conn.execute(
+                    'SELECT seq, kind, key, data FROM journal WHERE seq > ? ORDER BY seq LIMIT ?',
+                    (after, limit)
+                ).fetchall()
+            finally:
+                self._conn.execute('COMMIT')
+
+    def catch_up(self, seq=None, batch_size=1000):
+        # Apply entries up to `seq`, or all there are
+        with self._apply_lock:
+            while seq is None or self.position < seq:
+                entries = self._read(self.position, batch_size)
+                if entries is None:
+                    position = self.end()
+                    print(f"Journal trimmed past entry {self.position}, rebuilding from the stores")
+                    self.resync(position)
+                    self.position = position
+                    continue
+                for entry_seq, kind, key, data in entries:
+                    try:
+                        self.apply(entry_seq, kind, key, json.loads(data) if data is not None else None)
+                    except Exception as e:
+                        print(f"Error applying journal entry {entry_seq}: {str(e)}")
+                    self.position = entry_seq
+                if len(entries) < batch_size:
+                    break
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='journal-poll', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.catch_up()
+            except Exception as e:
+                print(f"Error reading journal: {str(e)}")
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,104 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Minimal in-process counters and histograms in Prometheus text format.
+
+    Collectors registered with add_collector() are read at render time,
+    for values other components already track (cache hit counts, pool
+    sizes) and that should not be counted twice.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # Per-bucket counts (made cumulative on render), then sum and count
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def add_collector(self, collector):
+        # collector() yields (name, type, labels dict, value)
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: list(state) for key, state in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name in sorted(counters):
+            header(name, 'counter')
+            for key, value in sorted(counters[name].items()):
+                lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+
+        for name in sorted(histograms):
+            header(name, 'histogram')
+            for key, state in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), state[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(float(bound))
+                    lines.append(f'{name}_bucket{_format_labels(key + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(state[-2])}')
+                lines.append(f'{name}_count{_format_labels(key)} {state[-1]}')
+
+        collected = {}
+        for collector in self._collectors:
+            try:
+                for name, kind, labels, value in collector():
+                    collected.setdefault((name, kind), []).append((tuple(sorted(labels.items())), value))
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+        for (name, kind), samples in sorted(collected.items()):
+            header(name, kind)
+            for key, value in samples:
+                lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
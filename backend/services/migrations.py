@@ -0,0 +1,168 @@
+import mysql.connector
+from mysql.connector import errorcode
+
+DEFAULT_GENRES = [
+    'Technology', 'Science', 'Arts', 'Literature',
+    'Music', 'Travel', 'Food', 'Sports', 'Gaming',
+    'Movies', 'Politics', 'Health', 'Education'
+]
+
+# Held while migrating so two processes starting at once don't both apply
+LOCK_NAME = 'blog_app_migrations'
+LOCK_TIMEOUT = 60
+
+
+def _create_tables(cursor):
+    # Also brings databases set up before schema_version existed to the
+    # same state, which is why it checks instead of assuming
+    cursor.execute("SHOW TABLES LIKE 'users'")
+    if cursor.fetchone() is not None:
+        cursor.execute("SHOW COLUMNS FROM users LIKE 'has_selected_genres'")
+        if cursor.fetchone() is None:
+            cursor.execute('''
+                ALTER TABLE users
+                ADD COLUMN has_selected_genres BOOLEAN DEFAULT FALSE
+            ''')
+    else:
+        cursor.execute('''
+            CREATE TABLE users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(50) UNIQUE NOT NULL,
+                email VARCHAR(100) UNIQUE NOT NULL,
+                password VARCHAR(255) NOT NULL,
+                has_selected_genres BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS genres (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) UNIQUE NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_genres (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            genre_id INT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (genre_id) REFERENCES genres(id),
+            UNIQUE KEY unique_user_genre (user_id, genre_id)
+        )
+    ''')
+
+    # Users from before has_selected_genres was tracked
+    cursor.execute('''
+        UPDATE users u
+        SET has_selected_genres = EXISTS (
+            SELECT 1 FROM user_genres ug
+            WHERE ug.user_id = u.id
+            GROUP BY ug.user_id
+            HAVING COUNT(*) >= 3
+        )
+        WHERE has_selected_genres IS NULL
+    ''')
+
+
+def _seed_genres(cursor):
+    placeholders = ', '.join(['(%s)'] * len(DEFAULT_GENRES))
+    cursor.execute(f'INSERT IGNORE INTO genres (name) VALUES {placeholders}', DEFAULT_GENRES)
+
+
+def _drop_user_genres_genre_index(cursor):
+    # Every user_genres query looks rows up by user_id, which the
+    # unique_user_genre (user_id, genre_id) key covers, as the unique keys
+    # on users.username and genres.name cover logins and genre lookups.
+    # Nothing reads by genre, so idx_user_genres_genre only cost writes.
+    # The genre_id foreign key still needs an index led by genre_id, and
+    # MySQL drops its implicit one once another index can stand in, so
+    # put a plain one back when that happened.
+    cursor.execute('''
+        SHOW INDEX FROM user_genres
+        WHERE Column_name = 'genre_id' AND Seq_in_index = 1
+        AND Key_name <> 'idx_user_genres_genre'
+    ''')
+    if cursor.fetchall():
+        cursor.execute('DROP INDEX idx_user_genres_genre ON user_genres')
+    else:
+        cursor.execute('''
+            ALTER TABLE user_genres
+            ADD INDEX genre_id (genre_id),
+            DROP INDEX idx_user_genres_genre
+        ''')
+
+
+# (version, description, SQL or callable(cursor)), applied in order. Only
+# ever append: a database records the last version it has, not which
+# statements produced it.
+MIGRATIONS = [
+    (1, 'users, genres and user_genres tables', _create_tables),
+    (2, 'default genres', _seed_genres),
+    # Who follows a genre, without touching the rows
+    (3, 'user_genres index by genre', 'CREATE INDEX idx_user_genres_genre ON user_genres (genre_id, user_id)'),
+    (4, 'drop the unused user_genres index by genre', _drop_user_genres_genre_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    # The single query a normal startup costs; 0 if never migrated
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        row = cursor.fetchone()
+        return (row[0] if row else None) or 0
+    except mysql.connector.Error as err:
+        if err.errno == errorcode.ER_NO_SUCH_TABLE:
+            return 0
+        raise
+    finally:
+        cursor.close()
+
+
+def migrate(conn, database, log=print):
+    # Apply pending migrations over a connection opened without a database;
+    # returns the versions applied
+    cursor = conn.cursor()
+    cursor.execute(f'CREATE DATABASE IF NOT EXISTS `{database}`')
+    cursor.execute(f'USE `{database}`')
+
+    cursor.execute('SELECT GET_LOCK(%s, %s)', (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError(f'Timed out waiting for the {LOCK_NAME} lock')
+
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Read under the lock: another process may have just migrated
+        current = schema_version(conn)
+        applied = []
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            log(f"Applying migration {version}: {description}")
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+            # MySQL commits DDL implicitly, so record each step as it lands
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                (version, description)
+            )
+            conn.commit()
+            applied.append(version)
+        return applied
+    finally:
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# Run inside the worker processes, so they must be module-level
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded process pool, off the request threads.
+
+    At most `max_pending` hash/verify jobs may be queued or running; past
+    that, calls fail fast with HasherBusy instead of piling up. With
+    workers=0 the work runs inline, still subject to the same bound.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=64, timeout=30):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so each server process gets its own pool;
+        # spawn avoids forking a parent that already runs threads
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # A worker died (OOM-killed, say) and left the pool unusable; the
+        # next _get_executor starts a fresh one
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many password operations in progress')
+        try:
+            if not self.workers:
+                return fn(*args)
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result(timeout=self.timeout)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+            # Retried once on a new pool; a second failure propagates
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    async def _run_async(self, fn, *args):
+        # Same bound as _run, but awaits the worker instead of blocking a thread
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many password operations in progress')
+        try:
+            if not self.workers:
+                return await asyncio.to_thread(fn, *args)
+            executor = self._get_executor()
+            try:
+                future = asyncio.wrap_future(executor.submit(fn, *args))
+                return await asyncio.wait_for(future, self.timeout)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+            future = asyncio.wrap_future(self._get_executor().submit(fn, *args))
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def verify(self, password, hashed):
+        return self._run(_check_password, password, hashed)
+
+    async def hash_async(self, password):
+        return await self._run_async(_hash_password, password, self.rounds)
+
+    async def verify_async(self, password, hashed):
+        return await self._run_async(_check_password, password, hashed)
+
+    def needs_rehash(self, hashed):
+        # bcrypt hashes look like $2b$<cost>$<salt+hash>; only a cost below
+        # the configured one is upgraded, never lowered
+        try:
+            return int(hashed.split('$')[2]) < self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,96 @@
+import bisect
+import heapq
+import itertools
+import threading
+
+
+def _sort_key(post):
+    return (post['created_at'], post['id'])
+
+
+class PostIndex:
+    """Process-wide in-memory index of posts grouped by genre."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # post_id -> post dict
+        self._posts = {}
+        # genre_id -> list of (created_at, post_id), oldest first
+        self._by_genre = {}
+
+    @classmethod
+    def load(cls, store):
+        index = cls()
+        for post in store.iter_posts():
+            index.add(post)
+        return index
+
+    def __len__(self):
+        return len(self._posts)
+
+    def all(self):
+        with self._lock:
+            return list(self._posts.values())
+
+    def get(self, post_id):
+        return self._posts.get(post_id)
+
+    def add(self, post):
+        with self._lock:
+            old = self._posts.get(post['id'])
+            if old is not None:
+                self._remove_key(old)
+            self._posts[post['id']] = post
+            keys = self._by_genre.setdefault(int(post['genre_id']), [])
+            key = _sort_key(post)
+            # New posts are almost always the newest in their genre
+            if not keys or keys[-1] < key:
+                keys.append(key)
+            else:
+                bisect.insort(keys, key)
+
+    def apply_counters(self, post_id, deltas):
+        # Copy on write: readers may still be serializing the old dict
+        with self._lock:
+            post = self._posts.get(post_id)
+            if post is None:
+                return
+            post = dict(post)
+            for field, amount in deltas.items():
+                post[field] = post.get(field, 0) + amount
+            self._posts[post_id] = post
+
+    def set_counters(self, post_id, counts):
+        # Replace counter fields with values read back from the store
+        with self._lock:
+            post = self._posts.get(post_id)
+            if post is None:
+                return
+            self._posts[post_id] = dict(post, **counts)
+
+    def _remove_key(self, post):
+        keys = self._by_genre.get(int(post['genre_id']), [])
+        key = _sort_key(post)
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def feed(self, genre_ids, before=None, limit=None):
+        # k-way merge of the user's genres, newest first. `before` is a
+        # (created_at, post_id) key; only strictly older posts are returned.
+        with self._lock:
+            runs = []
+            for genre_id in genre_ids:
+                keys = self._by_genre.get(int(genre_id))
+                if not keys:
+                    continue
+                end = bisect.bisect_left(keys, before) if before else len(keys)
+                # No genre can contribute more than `limit` posts to a page
+                start = max(0, end - limit) if limit else 0
+                runs.append(reversed(keys[start:end]))
+
+        merged = heapq.merge(*runs, reverse=True)
+        for _, post_id in itertools.islice(merged, limit):
+            post = self._posts.get(post_id)
+            if post is not None:
+                yield post
@@ -0,0 +1,440 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msgpack
+except ImportError:  # only needed for POST_ENCODING=msgpack
+    msgpack = None
+
+COUNTER_FIELDS = ('up_vote_count', 'down_vote_count', 'share_count')
+
+POST_ENCODINGS = ('json', 'msgpack')
+
+
+def check_encoding(encoding):
+    if encoding not in POST_ENCODINGS:
+        raise ValueError(f'Unknown POST_ENCODING: {encoding}')
+    if encoding == 'msgpack' and msgpack is None:
+        raise ValueError('POST_ENCODING=msgpack requires the msgpack package')
+
+
+def encode_post(post, encoding='json'):
+    # Compact bytes: minified JSON or msgpack
+    if encoding == 'msgpack':
+        return msgpack.packb(post, use_bin_type=True)
+    return json.dumps(post, separators=(',', ':')).encode('utf-8')
+
+
+def decode_post(data):
+    # Either encoding, and the old indented JSON files: a JSON document
+    # starts with '{', which is never the first byte of a msgpack map
+    if isinstance(data, str) or data.lstrip()[:1] == b'{':
+        return json.loads(data)
+    if msgpack is None:
+        raise ValueError('Post is msgpack-encoded but msgpack is not installed')
+    return msgpack.unpackb(data, raw=False)
+
+
+class PostStore:
+    """Durable storage for post documents.
+
+    Posts are plain dicts with at least id, genre_id, created_at and the
+    counter fields. Backends must apply counter updates atomically.
+    """
+
+    # Optional callable(op, nbytes, seconds), called after each read or
+    # write of post data (set by the app for I/O metrics)
+    io_observer = None
+
+    def _observe(self, op, nbytes, started):
+        if self.io_observer is not None:
+            self.io_observer(op, nbytes, time.perf_counter() - started)
+
+    def get(self, post_id):
+        raise NotImplementedError
+
+    def create(self, post):
+        # Must fail rather than overwrite an existing post with the same id
+        raise NotImplementedError
+
+    def create_many(self, posts):
+        # Bulk import; existing posts are replaced
+        for post in posts:
+            self.create(post)
+
+    def iter_posts(self):
+        raise NotImplementedError
+
+    def scan_genre(self, genre_id, before=None, limit=None):
+        # Posts of one genre, newest first, strictly older than the
+        # (created_at, id) key `before`
+        raise NotImplementedError
+
+    def increment(self, post_id, field, amount=1):
+        # Returns the updated post, or None if it does not exist
+        raise NotImplementedError
+
+    def apply_counters(self, batch):
+        # batch: {post_id: {field: delta}}, as flushed by CounterBuffer.
+        # Returns {post_id: {field: delta}} for what could not be written,
+        # so only that is retried; raising means none of it was written.
+        # Deltas for posts that no longer exist are dropped.
+        failed = {}
+        for post_id, deltas in batch.items():
+            for field, amount in deltas.items():
+                try:
+                    self.increment(post_id, field, amount)
+                except Exception as e:
+                    print(f"Error updating {field} of post {post_id}: {str(e)}")
+                    failed.setdefault(post_id, {})[field] = amount
+        return failed
+
+    def reopen(self):
+        # Called in a worker right after fork; backends holding a
+        # connection open a fresh one
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonDirPostStore(PostStore):
+    """One document per post in a directory (the original layout).
+
+    New posts are written in `encoding`, as <id>.json or <id>.msgpack;
+    files in the other encoding, including the old indented JSON, are
+    still read and keep their encoding when their counters change.
+    """
+
+    EXTENSIONS = {'json': '.json', 'msgpack': '.msgpack'}
+
+    def __init__(self, posts_dir, encoding='json'):
+        check_encoding(encoding)
+        self.posts_dir = posts_dir
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        os.makedirs(posts_dir, exist_ok=True)
+
+    def _path(self, post_id, encoding=None):
+        return os.path.join(self.posts_dir, f'{post_id}{self.EXTENSIONS[encoding or self.encoding]}')
+
+    def _find(self, post_id):
+        # (path, encoding) of an existing post, configured encoding first
+        for encoding in sorted(self.EXTENSIONS, key=lambda e: e != self.encoding):
+            path = self._path(post_id, encoding)
+            if os.path.exists(path):
+                return path, encoding
+        return None, None
+
+    def _write(self, post, mode='w'):
+        started = time.perf_counter()
+        data = encode_post(post, self.encoding)
+        with open(self._path(post['id']), mode + 'b') as f:
+            f.write(data)
+        self._observe('write', len(data), started)
+
+    def _read(self, path):
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            data = f.read()
+        self._observe('read', len(data), started)
+        return decode_post(data)
+
+    def get(self, post_id):
+        path, _ = self._find(post_id)
+        if path is None:
+            return None
+        try:
+            return self._read(path)
+        except FileNotFoundError:
+            return None
+
+    def create(self, post):
+        # 'x' refuses to overwrite an existing post with the same id
+        self._write(post, mode='x')
+
+    def create_many(self, posts):
+        for post in posts:
+            self._write(post)
+
+    def iter_posts(self):
+        extensions = tuple(self.EXTENSIONS.values())
+        for filename in os.listdir(self.posts_dir):
+            if not filename.endswith(extensions):
+                continue
+            try:
+                post = self._read(os.path.join(self.posts_dir, filename))
+            except Exception as e:
+                print(f"Error reading post file {filename}: {str(e)}")
+                continue
+            yield post
+
+    def scan_genre(self, genre_id, before=None, limit=None):
+        # This layout has no secondary index, so a scan reads everything
+        keys = sorted(
+            (
+                (post['created_at'], post['id'], post)
+                for post in self.iter_posts()
+                if int(post['genre_id']) == int(genre_id)
+            ),
+            key=lambda item: item[:2],
+            reverse=True
+        )
+        posts = [post for created_at, post_id, post in keys
+                 if not before or (created_at, post_id) < tuple(before)]
+        return posts[:limit] if limit else posts
+
+    def increment(self, post_id, field, amount=1):
+        return self._update_counters(post_id, {field: amount})
+
+    def apply_counters(self, batch):
+        # One rewrite per post per flush, however many votes it collected
+        failed = {}
+        for post_id, deltas in batch.items():
+            try:
+                self._update_counters(post_id, deltas)
+            except Exception as e:
+                # Unreadable or unwritable; the other posts still land
+                print(f"Error updating counters of post {post_id}: {str(e)}")
+                failed[post_id] = deltas
+        return failed
+
+    def _update_counters(self, post_id, deltas):
+        with self._lock:
+            path, encoding = self._find(post_id)
+            if path is None:
+                return None
+            try:
+                f = open(path, 'r+b')
+            except FileNotFoundError:
+                return None
+            with f:
+                # Serialize with other worker processes rewriting this post
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                started = time.perf_counter()
+                data = f.read()
+                self._observe('read', len(data), started)
+                post = decode_post(data)
+                for field, amount in deltas.items():
+                    post[field] = post.get(field, 0) + amount
+                started = time.perf_counter()
+                data = encode_post(post, encoding)
+                f.seek(0)
+                f.write(data)
+                f.truncate()
+                self._observe('write', len(data), started)
+            return post
+
+
+class SQLitePostStore(PostStore):
+    """All posts in a single SQLite file, indexed by genre and time.
+
+    The non-indexed fields are kept in a body column, as compact JSON text
+    or a msgpack blob depending on `encoding`; either is read back.
+    """
+
+    def __init__(self, path, encoding='json'):
+        check_encoding(encoding)
+        self.path = path
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS posts (
+                id TEXT PRIMARY KEY,
+                genre_id INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                up_vote_count INTEGER NOT NULL DEFAULT 0,
+                down_vote_count INTEGER NOT NULL DEFAULT 0,
+                share_count INTEGER NOT NULL DEFAULT 0,
+                body TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_posts_genre_created
+            ON posts (genre_id, created_at, id)
+        ''')
+
+    _COLUMNS = 'id, genre_id, created_at, up_vote_count, down_vote_count, share_count, body'
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def reopen(self):
+        # Forked workers open their own connection
+        with self._lock:
+            self._conn = self._connect()
+
+    @staticmethod
+    def _to_post(row):
+        post_id, genre_id, created_at, up, down, share, body = row
+        post = decode_post(body)
+        post.update({
+            'id': post_id,
+            'created_at': created_at,
+            'up_vote_count': up,
+            'down_vote_count': down,
+            'share_count': share
+        })
+        # Keep genre_id exactly as the client sent it (the body has it)
+        post.setdefault('genre_id', genre_id)
+        return post
+
+    def _to_row(self, post):
+        body = {k: v for k, v in post.items() if k not in COUNTER_FIELDS and k not in ('id', 'created_at')}
+        body = encode_post(body, self.encoding)
+        return (
+            post['id'],
+            int(post['genre_id']),
+            post['created_at'],
+            post.get('up_vote_count', 0),
+            post.get('down_vote_count', 0),
+            post.get('share_count', 0),
+            # Text keeps JSON bodies readable from the sqlite3 shell
+            body.decode('utf-8') if self.encoding == 'json' else body
+        )
+
+    @staticmethod
+    def _body_bytes(rows):
+        return sum(len(row[-1]) for row in rows)
+
+    def get(self, post_id):
+        started = time.perf_counter()
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {self._COLUMNS} FROM posts WHERE id = ?', (post_id,)
+            ).fetchone()
+        self._observe('read', len(row[-1]) if row else 0, started)
+        return self._to_post(row) if row else None
+
+    def create(self, post):
+        started = time.perf_counter()
+        row = self._to_row(post)
+        with self._lock:
+            self._conn.execute(
+                f'INSERT INTO posts ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)', row
+            )
+        self._observe('write', len(row[-1]), started)
+
+    def create_many(self, posts):
+        started = time.perf_counter()
+        rows = [self._to_row(post) for post in posts]
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    f'INSERT OR REPLACE INTO posts ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        self._observe('write', self._body_bytes(rows), started)
+
+    def iter_posts(self):
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {self._COLUMNS} FROM posts').fetchall()
+        self._observe('read', self._body_bytes(rows), started)
+        for row in rows:
+            yield self._to_post(row)
+
+    def scan_genre(self, genre_id, before=None, limit=None):
+        sql = f'SELECT {self._COLUMNS} FROM posts WHERE genre_id = ?'
+        params = [int(genre_id)]
+        if before:
+            sql += ' AND (created_at, id) < (?, ?)'
+            params.extend(before)
+        sql += ' ORDER BY created_at DESC, id DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        self._observe('read', self._body_bytes(rows), started)
+        return [self._to_post(row) for row in rows]
+
+    def increment(self, post_id, field, amount=1):
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f'Unknown counter field: {field}')
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._conn.execute(
+                f'UPDATE posts SET {field} = {field} + ? WHERE id = ? RETURNING {self._COLUMNS}',
+                (amount, post_id)
+            ).fetchall()
+        self._observe('write', 0, started)
+        return self._to_post(rows[0]) if rows else None
+
+    def apply_counters(self, batch):
+        rows = [
+            (
+                deltas.get('up_vote_count', 0),
+                deltas.get('down_vote_count', 0),
+                deltas.get('share_count', 0),
+                post_id
+            )
+            for post_id, deltas in batch.items()
+        ]
+        started = time.perf_counter()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany('''
+                    UPDATE posts SET
+                        up_vote_count = up_vote_count + ?,
+                        down_vote_count = down_vote_count + ?,
+                        share_count = share_count + ?
+                    WHERE id = ?
+                ''', rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        self._observe('write', 0, started)
+        return {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_post_store(config):
+    backend = config['POST_STORE']
+    if backend == 'json':
+        return JsonDirPostStore(config['POSTS_DIR'], config['POST_ENCODING'])
+    if backend == 'sqlite':
+        return SQLitePostStore(config['POSTS_DB'], config['POST_ENCODING'])
+    raise ValueError(f'Unknown POST_STORE backend: {backend}')
+
+
+def import_posts_dir(posts_dir, store, batch_size=1000):
+    # One-shot import of a posts directory (either encoding) into another backend
+    source = JsonDirPostStore(posts_dir)
+    batch = []
+    count = 0
+    for post in source.iter_posts():
+        batch.append(post)
+        if len(batch) >= batch_size:
+            store.create_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        store.create_many(batch)
+        count += len(batch)
+    return count
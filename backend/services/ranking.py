@@ -0,0 +1,87 @@
+import bisect
+import heapq
+import itertools
+import math
+import threading
+from datetime import datetime, timezone
+
+# Arbitrary fixed origin for hot scores; only differences matter
+HOT_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def top_score(post, share_weight=2):
+    return post['up_vote_count'] - post['down_vote_count'] + share_weight * post['share_count']
+
+
+def hot_score(post, share_weight=2, period=45000):
+    # Time decay without rescoring: rather than shrinking every score as
+    # time passes, newer posts start higher. Every `period` seconds of age
+    # is worth a factor of 10 in net votes, and relative order between two
+    # posts never changes unless one of them is voted on.
+    score = top_score(post, share_weight)
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    created = datetime.fromisoformat(post['created_at'])
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return round(sign * order + (created.timestamp() - HOT_EPOCH) / period, 7)
+
+
+class PostRanking:
+    """Per-genre posts kept sorted by score, updated as counts change.
+
+    Each (order, genre) holds an ascending list of (score, post_id). A
+    vote moves one entry (bisect out, insort back in); a top-N read
+    merges the tail of each of the user's genres and stops after N.
+    """
+
+    def __init__(self, share_weight=2, hot_period=45000):
+        self._scorers = {
+            'hot': lambda post: hot_score(post, share_weight, hot_period),
+            'top': lambda post: top_score(post, share_weight)
+        }
+        self._lock = threading.Lock()
+        # order -> genre_id -> [(score, post_id)]
+        self._ranked = {order: {} for order in self._scorers}
+        # order -> post_id -> (genre_id, score)
+        self._scores = {order: {} for order in self._scorers}
+
+    @property
+    def orders(self):
+        return tuple(self._scorers)
+
+    @classmethod
+    def build(cls, posts, **kwargs):
+        ranking = cls(**kwargs)
+        for post in posts:
+            ranking.update(post)
+        return ranking
+
+    def update(self, post):
+        genre_id = int(post['genre_id'])
+        with self._lock:
+            for order, scorer in self._scorers.items():
+                score = scorer(post)
+                ranked = self._ranked[order].setdefault(genre_id, [])
+                old = self._scores[order].get(post['id'])
+                if old is not None:
+                    if old == (genre_id, score):
+                        continue
+                    old_ranked = self._ranked[order].get(old[0], [])
+                    i = bisect.bisect_left(old_ranked, (old[1], post['id']))
+                    if i < len(old_ranked) and old_ranked[i] == (old[1], post['id']):
+                        del old_ranked[i]
+                bisect.insort(ranked, (score, post['id']))
+                self._scores[order][post['id']] = (genre_id, score)
+
+    def top(self, order, genre_ids, before=None, limit=20):
+        # Post ids by descending score, strictly below the (score, post_id) key `before`
+        with self._lock:
+            runs = []
+            for genre_id in genre_ids:
+                ranked = self._ranked[order].get(int(genre_id))
+                if not ranked:
+                    continue
+                end = bisect.bisect_left(ranked, before) if before else len(ranked)
+                runs.append(reversed(ranked[max(0, end - limit):end]))
+        return list(itertools.islice(heapq.merge(*runs, reverse=True), limit))
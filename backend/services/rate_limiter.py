@@ -0,0 +1,152 @@
+import math
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class RateLimitBackend:
+    """Token-bucket state store.
+
+    consume() takes `cost` tokens from the bucket for `key`, refilled at
+    `rate` tokens per second up to `burst`, and returns (allowed,
+    seconds until enough tokens are available).
+    """
+
+    def consume(self, key, rate, burst, cost=1):
+        raise NotImplementedError
+
+    def reopen(self):
+        # Called in a worker right after fork
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets in this process only, spread over independently locked shards.
+
+    Each shard keeps its buckets in least recently used order and holds at
+    most `max_keys_per_shard`; a new key past that evicts the LRU bucket.
+    """
+
+    def __init__(self, shards=16, max_keys_per_shard=10000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+
+    def consume(self, key, rate, burst, cost=1):
+        lock, buckets = self._shards[zlib.crc32(key.encode('utf-8')) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            buckets[key] = (tokens, now)
+            buckets.move_to_end(key)
+            if len(buckets) > self.max_keys_per_shard:
+                # The LRU bucket has had the longest to refill; forgetting
+                # it at worst hands that key a full bucket
+                buckets.popitem(last=False)
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+
+class SQLiteBackend(RateLimitBackend):
+    """Buckets in a SQLite file, shared by every worker process on the host.
+
+    Stands in for a networked store such as Redis: each consume is one
+    short write transaction, so all workers see the same buckets.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def reopen(self):
+        # Forked workers open their own connection
+        with self._lock:
+            self._conn = self._connect()
+
+    def consume(self, key, rate, burst, cost=1):
+        # Wall-clock time, since the buckets are shared between processes
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT tokens, updated FROM buckets WHERE key = ?', (key,)
+                ).fetchone()
+                tokens = _refill(*(row or (burst, now)), now, rate, burst)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                    (key, tokens, now)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self, backend, limits):
+        self.backend = backend
+        # endpoint -> (tokens per second, burst)
+        self.limits = limits
+
+    def check(self, endpoint, key):
+        limit = self.limits.get(endpoint)
+        if not limit:
+            return True, 0
+        rate, burst = limit
+        return self.backend.consume(f'{endpoint}:{key}', rate, burst)
+
+
+def create_rate_limiter(config):
+    backend = config['RATE_LIMIT_BACKEND']
+    if backend == 'memory':
+        return RateLimiter(MemoryBackend(), config['RATE_LIMITS'])
+    if backend == 'sqlite':
+        return RateLimiter(SQLiteBackend(config['RATE_LIMIT_DB']), config['RATE_LIMITS'])
+    raise ValueError(f'Unknown RATE_LIMIT_BACKEND: {backend}')
+
+
+def rate_limit(endpoint, per='user'):
+    # Throttle a view by the caller's user id (stack it under token_required,
+    # which passes current_user first) or, with per='ip', by client address
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = f'user:{args[0]}' if per == 'user' else f'ip:{request.remote_addr}'
+            allowed, retry_after = current_app.rate_limiter.check(endpoint, key)
+            if not allowed:
+                return jsonify({'message': 'Too many requests'}), 429, {
+                    'Retry-After': str(max(1, math.ceil(retry_after)))
+                }
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
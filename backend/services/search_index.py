@@ -0,0 +1,144 @@
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import threading
+
+FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    if text is None:
+        return []
+    # Posts stored before post_text was validated may hold other types
+    if not isinstance(text, str):
+        text = str(text)
+    return [token.lower() for token in _TOKEN_RE.findall(text)]
+
+
+class SearchIndex:
+    """In-memory inverted index over post_text with BM25 ranking.
+
+    Posts are numbered internally; postings map term -> {doc number: term
+    frequency}. The index can be saved as gzipped JSON and reloaded,
+    after which only posts missing from the file need tokenizing.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = {}
+        # Per doc number: post id, genre id, token count
+        self._doc_ids = []
+        self._doc_genres = []
+        self._doc_lengths = []
+        self._doc_numbers = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_numbers)
+
+    def __contains__(self, post_id):
+        return post_id in self._doc_numbers
+
+    def add(self, post):
+        # Post text never changes, so a post already indexed is left alone
+        if post['id'] in self._doc_numbers:
+            return
+        genre_id = int(post['genre_id'])
+        tokens = tokenize(post.get('post_text'))
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        with self._lock:
+            if post['id'] in self._doc_numbers:
+                return
+            doc = len(self._doc_ids)
+            self._doc_numbers[post['id']] = doc
+            self._doc_ids.append(post['id'])
+            self._doc_genres.append(genre_id)
+            self._doc_lengths.append(len(tokens))
+            self._total_length += len(tokens)
+            for token, frequency in frequencies.items():
+                self._postings.setdefault(token, {})[doc] = frequency
+
+    def search(self, query, genre_id=None, limit=20):
+        # [(score, post_id)], best first
+        terms = set(tokenize(query))
+        genre_id = int(genre_id) if genre_id is not None else None
+        with self._lock:
+            count = len(self._doc_ids)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, frequency in postings.items():
+                    if genre_id is not None and self._doc_genres[doc] != genre_id:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc] / average_length)
+                    scores[doc] = scores.get(doc, 0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(score, self._doc_ids[doc]) for doc, score in best]
+
+    def save(self, path):
+        with self._lock:
+            data = {
+                'version': FORMAT_VERSION,
+                'docs': [self._doc_ids, self._doc_genres, self._doc_lengths],
+                # Flattened [doc, tf, doc, tf, ...] per term
+                'postings': {
+                    term: [n for item in postings.items() for n in item]
+                    for term, postings in self._postings.items()
+                }
+            }
+        # Write beside the target and rename, so readers never see half a file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        index = cls(**kwargs)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported search index format: {data.get("version")}')
+        index._doc_ids, index._doc_genres, index._doc_lengths = data['docs']
+        index._doc_numbers = {post_id: doc for doc, post_id in enumerate(index._doc_ids)}
+        index._total_length = sum(index._doc_lengths)
+        index._postings = {
+            term: dict(zip(flat[::2], flat[1::2]))
+            for term, flat in data['postings'].items()
+        }
+        return index
+
+    @classmethod
+    def build(cls, posts, path=None):
+        # Start from the saved index when there is one, then add whatever
+        # was created since it was written
+        index = None
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+            except Exception as e:
+                print(f"Error loading search index {path}: {str(e)}")
+        if index is None:
+            index = cls()
+        for post in posts:
+            try:
+                index.add(post)
+            except Exception as e:
+                print(f"Error indexing post {post.get('id')}: {str(e)}")
+        return index
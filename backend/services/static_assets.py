@@ -0,0 +1,134 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from services.compression import choose_encoding, is_compressible, matching_etag, precompress, variant_etag
+
+# Relative references to other assets inside HTML, CSS and JS: quoted
+# paths and url(...) arguments with a known asset extension
+_REFERENCE = re.compile(
+    r'''(?P<open>["'(])(?P<path>[\w./-]+\.(?:css|js|png|jpe?g|gif|svg|webp|ico|woff2?))(?P<close>["')])'''
+)
+
+_TEXT_EXTENSIONS = ('.html', '.css', '.js')
+
+
+class Asset:
+    def __init__(self, body, mimetype, immutable):
+        self.body = body
+        self.mimetype = mimetype
+        self.immutable = immutable
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {}
+
+
+class StaticAssets:
+    """The frontend directory, prepared once at startup and served from memory.
+
+    Every asset except the HTML pages is also published under a
+    content-hashed name (css/style.1a2b3c4d5e6f.css), and references to it
+    in the pages, stylesheets and scripts are rewritten to that name, so
+    hashed assets can be cached for good and a deploy still busts them.
+    Pages and unhashed names are revalidated by ETag. Compressible files
+    get gzip (and, with the brotli package, br) variants up front.
+    """
+
+    def __init__(self, root, max_age=365 * 24 * 60 * 60, min_size=1024):
+        self.root = root
+        self.max_age = max_age
+        self.min_size = min_size
+        self._sources = {}
+        self._hashed_names = {}
+        self._assets = {}
+
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                path = os.path.relpath(full_path, root).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    self._sources[path] = f.read()
+
+        for path in self._sources:
+            self._prepare(path, ())
+
+    def __len__(self):
+        return len(self._sources)
+
+    def get(self, path):
+        return self._assets.get(path)
+
+    def hashed_name(self, path):
+        return self._hashed_names.get(path)
+
+    def _prepare(self, path, stack):
+        # Returns the name references to `path` should use; dependencies are
+        # prepared first, since their hashed names feed into this file's hash
+        if path in self._hashed_names:
+            return self._hashed_names[path]
+
+        body = self._sources[path]
+        if path.endswith(_TEXT_EXTENSIONS):
+            body = self._rewrite(path, body, stack + (path,))
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self._add(path, body, mimetype, immutable=False)
+
+        if path.endswith('.html'):
+            # Pages keep their URLs; links and redirects point at them
+            self._hashed_names[path] = path
+            return path
+
+        stem, ext = posixpath.splitext(path)
+        hashed = f'{stem}.{self._assets[path].etag[:12]}{ext}'
+        self._assets[hashed] = Asset(body, mimetype, immutable=True)
+        self._assets[hashed].variants = self._assets[path].variants
+        self._hashed_names[path] = hashed
+        return hashed
+
+    def _rewrite(self, path, body, stack):
+        def replace(match):
+            ref = match.group('path')
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(path), ref))
+            # Unknown files and import cycles keep their plain name
+            if target not in self._sources or target in stack:
+                return match.group(0)
+            hashed = self._prepare(target, stack)
+            ref = posixpath.join(posixpath.dirname(ref), posixpath.basename(hashed))
+            return match.group('open') + ref + match.group('close')
+
+        return _REFERENCE.sub(replace, body.decode('utf-8')).encode('utf-8')
+
+    def _add(self, path, body, mimetype, immutable):
+        asset = Asset(body, mimetype, immutable)
+        if is_compressible(mimetype):
+            asset.variants = precompress(body, self.min_size)
+        self._assets[path] = asset
+
+    def response(self, path, accept_encodings, if_none_match):
+        # (body, status, headers) for a request, or None if there is no such file
+        asset = self.get(path)
+        if asset is None:
+            return None
+
+        encoding = choose_encoding(accept_encodings, asset.variants)
+        etag = variant_etag(asset.etag, encoding) if encoding else asset.etag
+        headers = {'ETag': f'"{etag}"'}
+        if asset.immutable:
+            headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        else:
+            headers['Cache-Control'] = 'public, no-cache'
+        if asset.variants:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if matching_etag(asset.etag, if_none_match):
+            return b'', 304, headers
+
+        charset = '; charset=utf-8' if asset.mimetype.startswith('text/') else ''
+        headers['Content-Type'] = asset.mimetype + charset
+        body = asset.body
+        if encoding:
+            body = asset.variants[encoding]
+            headers['Content-Encoding'] = encoding
+        return body, 200, headers
@@ -0,0 +1,160 @@
+import bisect
+import heapq
+import itertools
+import threading
+from collections import OrderedDict, deque
+
+
+def _sort_key(post):
+    return (post['created_at'], post['id'])
+
+
+class _Timeline:
+    """One user's recent (created_at, post_id) keys, oldest first."""
+
+    def __init__(self, genre_ids, pushed_genres, keys, size):
+        self.genre_ids = genre_ids
+        # The user's genres that are fanned out to this timeline; the rest
+        # are large genres read from the post index
+        self.pushed_genres = pushed_genres
+        self.keys = deque(keys, maxlen=size)
+        # False once older posts may have been dropped off the front
+        self.complete = len(self.keys) < size
+
+    def push(self, key):
+        keys = self.keys
+        if not keys or keys[-1] < key:
+            if len(keys) == keys.maxlen:
+                self.complete = False
+            keys.append(key)
+            return
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return
+        if len(keys) == keys.maxlen:
+            self.complete = False
+            if i == 0:
+                return
+            keys.popleft()
+            i -= 1
+        keys.insert(i, key)
+
+    def page(self, before, limit):
+        # Newest-first keys strictly older than `before`, or None when the
+        # buffer no longer reaches back far enough to fill the page
+        keys = self.keys
+        end = bisect.bisect_left(keys, before) if before else len(keys)
+        start = end - limit
+        if start < 0 and not self.complete:
+            return None
+        return [keys[i] for i in range(end - 1, max(start, 0) - 1, -1)]
+
+
+class TimelineStore:
+    """Materialized 'new' feeds: fan-out on write into per-user ring buffers.
+
+    A timeline holds the newest `size` post keys from the user's genres and
+    is built from the post index on the user's first feed read, so only
+    recently active users (at most `max_users`, LRU) have one. New posts
+    are pushed into the timeline of every such user following the genre.
+    Once a genre has more than `fanout_limit` of those followers it counts
+    as large: it is no longer fanned out, and reads merge it in from the
+    post index instead. A read is then a slice of the buffer, plus one
+    index run per large genre; pages past the buffer fall back to the index.
+    """
+
+    def __init__(self, index, size=500, max_users=10000, fanout_limit=1000):
+        self.index = index
+        self.size = size
+        self.max_users = max_users
+        self.fanout_limit = fanout_limit
+        self._lock = threading.Lock()
+        # user_id -> _Timeline, least recently read first
+        self._timelines = OrderedDict()
+        # genre_id -> user_ids whose timelines that genre is pushed to
+        self._followers = {}
+        self._large = set()
+
+    def __len__(self):
+        return len(self._timelines)
+
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._timelines), 'large_genres': len(self._large)}
+
+    def push(self, post):
+        genre_id = int(post['genre_id'])
+        key = _sort_key(post)
+        with self._lock:
+            for user_id in self._followers.get(genre_id, ()):
+                self._timelines[user_id].push(key)
+
+    def invalidate(self, user_id):
+        # The user's genres changed; the next read rebuilds the timeline
+        with self._lock:
+            self._drop(user_id)
+
+    def feed(self, user_id, genre_ids, before=None, limit=20):
+        genre_ids = frozenset(int(genre_id) for genre_id in genre_ids)
+        with self._lock:
+            timeline = self._timelines.get(user_id)
+            if timeline is None or timeline.genre_ids != genre_ids:
+                timeline = self._build(user_id, genre_ids)
+            else:
+                self._timelines.move_to_end(user_id)
+            keys = timeline.page(before, limit)
+            large = genre_ids - timeline.pushed_genres
+
+        if keys is None:
+            return list(self.index.feed(genre_ids, before=before, limit=limit))
+
+        if large:
+            runs = [keys, (_sort_key(post) for post in self.index.feed(large, before=before, limit=limit))]
+            keys = itertools.islice(heapq.merge(*runs, reverse=True), limit)
+
+        posts = []
+        for _, post_id in keys:
+            post = self.index.get(post_id)
+            if post is not None:
+                posts.append(post)
+        return posts
+
+    def _build(self, user_id, genre_ids):
+        self._drop(user_id)
+
+        pushed = set()
+        for genre_id in genre_ids:
+            if genre_id in self._large:
+                continue
+            followers = self._followers.setdefault(genre_id, set())
+            if len(followers) >= self.fanout_limit:
+                self._make_large(genre_id)
+                continue
+            followers.add(user_id)
+            pushed.add(genre_id)
+
+        posts = self.index.feed(pushed, limit=self.size) if pushed else ()
+        keys = [_sort_key(post) for post in posts]
+        keys.reverse()
+        timeline = _Timeline(genre_ids, frozenset(pushed), keys, self.size)
+        self._timelines[user_id] = timeline
+
+        while len(self._timelines) > self.max_users:
+            self._drop(next(iter(self._timelines)))
+        return timeline
+
+    def _make_large(self, genre_id):
+        # Timelines holding this genre's posts would now double count them
+        # against the index run, so they are rebuilt without it
+        self._large.add(genre_id)
+        for user_id in list(self._followers.pop(genre_id, ())):
+            self._drop(user_id)
+
+    def _drop(self, user_id):
+        timeline = self._timelines.pop(user_id, None)
+        if timeline is None:
+            return
+        for genre_id in timeline.pushed_genres:
+            followers = self._followers.get(genre_id)
+            if followers is not None:
+                followers.discard(user_id)
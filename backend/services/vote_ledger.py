@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+
+VOTE_VALUES = {'up': 1, 'down': -1, 'none': 0}
+VOTE_NAMES = {1: 'up', -1: 'down'}
+VOTE_FIELDS = {1: 'up_vote_count', -1: 'down_vote_count'}
+
+
+def counter_deltas(old, new):
+    # Counter changes needed to move a user's vote from `old` to `new`
+    deltas = {}
+    if old:
+        deltas[VOTE_FIELDS[old]] = -1
+    if new:
+        deltas[VOTE_FIELDS[new]] = deltas.get(VOTE_FIELDS[new], 0) + 1
+    return deltas
+
+
+def reconcile_counts(ledger, store, index):
+    # Bring stored vote counts back in line with the ledger. Counter deltas
+    # are written behind the vote (see CounterBuffer), so a crash can lose
+    # the last few; run at startup, before any worker takes votes. Returns
+    # the number of posts corrected.
+    tallies = ledger.tallies()
+    batch = {}
+    for post in index.all():
+        up, down = tallies.get(post['id'], (0, 0))
+        deltas = {}
+        if post.get('up_vote_count', 0) != up:
+            deltas['up_vote_count'] = up - post.get('up_vote_count', 0)
+        if post.get('down_vote_count', 0) != down:
+            deltas['down_vote_count'] = down - post.get('down_vote_count', 0)
+        if deltas:
+            batch[post['id']] = deltas
+    if not batch:
+        return 0
+
+    failed = store.apply_counters(batch)
+    for post_id, deltas in batch.items():
+        if post_id not in failed:
+            index.apply_counters(post_id, deltas)
+    return len(batch) - len(failed)
+
+
+class VoteLedger:
+    """Who voted what, keyed by (user_id, post_id).
+
+    SQLite is the source of truth, so a vote is idempotent even when the
+    same user hits different workers. Reads go to it as well: a page of
+    posts costs one primary-key lookup for the caller's own votes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS votes (
+                user_id INTEGER NOT NULL,
+                post_id TEXT NOT NULL,
+                vote INTEGER NOT NULL,
+                PRIMARY KEY (user_id, post_id)
+            ) WITHOUT ROWID
+        ''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def reopen(self):
+        # A SQLite connection must not be used across fork(); forked
+        # workers open their own
+        with self._lock:
+            self._conn = self._connect()
+
+    def get(self, user_id, post_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT vote FROM votes WHERE user_id = ? AND post_id = ?',
+                (user_id, post_id)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def votes_for(self, user_id, post_ids):
+        # {post_id: vote} for the posts among `post_ids` the user voted on
+        if not post_ids:
+            return {}
+        placeholders = ', '.join(['?'] * len(post_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT post_id, vote FROM votes WHERE user_id = ? AND post_id IN ({placeholders})',
+                (user_id, *post_ids)
+            ).fetchall()
+        return dict(rows)
+
+    def tallies(self):
+        # {post_id: (up votes, down votes)} over the whole ledger
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT post_id, SUM(vote = 1), SUM(vote = -1)
+                FROM votes GROUP BY post_id
+            ''').fetchall()
+        return {post_id: (up, down) for post_id, up, down in rows}
+
+    def cast(self, user_id, post_id, vote):
+        # Record `vote` (1, -1 or 0 to retract); returns the previous vote
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT vote FROM votes WHERE user_id = ? AND post_id = ?',
+                    (user_id, post_id)
+                ).fetchone()
+                old = row[0] if row else 0
+                if old != vote:
+                    if vote:
+                        self._conn.execute(
+                            'INSERT OR REPLACE INTO votes (user_id, post_id, vote) VALUES (?, ?, ?)',
+                            (user_id, post_id, vote)
+                        )
+                    else:
+                        self._conn.execute(
+                            'DELETE FROM votes WHERE user_id = ? AND post_id = ?',
+                            (user_id, post_id)
+                        )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            return old
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,6 @@
+from app import create_app
+
+# WSGI entry point for production servers; see gunicorn.conf.py.
+# Building the app here means gunicorn's preload_app runs create_app
+# (schema setup, post index, ranking and search index) once in the master.
+app = create_app()
@@ -5,45 +5,124 @@ const newPostTextarea = document.getElementById('newPost');
 const postGenreSelect = document.getElementById('postGenre');
 const submitPostBtn = document.getElementById('submitPost');
 
-// Fetch posts
-async function fetchPosts() {
+// Pagination state
+let loadedPosts = [];
+let nextCursor = null;
+// Server version of the loaded feed, used to fetch only what changed
+let feedVersion = null;
+
+// Feed order: newest first, ties broken by id
+function newestFirst(a, b) {
+    return b.created_at.localeCompare(a.created_at) || b.id.localeCompare(a.id);
+}
+
+// Fetch posts (first page, or the next page when loadMore is set)
+async function fetchPosts(loadMore = false) {
     try {
-        const response = await fetch(`${API_URL}/posts`, {
+        const params = new URLSearchParams();
+        if (loadMore && nextCursor) {
+            params.set('before', nextCursor);
+        }
+        const response = await fetch(`${API_URL}/posts?${params}`, {
             headers: {
                 'Authorization': `Bearer ${localStorage.getItem('token')}`
             }
         });
-        const posts = await response.json();
-        displayPosts(posts);
+        const data = await response.json();
+        if (loadMore) {
+            // Skip posts that refreshChanges already added
+            const loadedIds = new Set(loadedPosts.map(post => post.id));
+            loadedPosts = loadedPosts.concat(data.posts.filter(post => !loadedIds.has(post.id)));
+        } else {
+            loadedPosts = data.posts;
+        }
+        nextCursor = data.next_cursor;
+        if (!loadMore) {
+            feedVersion = data.version;
+        }
+        displayPosts(loadedPosts);
     } catch (error) {
         console.error('Error fetching posts:', error);
     }
 }
 
+// Patch the loaded feed with posts created or changed since feedVersion
+async function refreshChanges() {
+    if (!feedVersion) {
+        return fetchPosts();
+    }
+
+    try {
+        const response = await fetch(`${API_URL}/posts/changes?since=${encodeURIComponent(feedVersion)}`, {
+            headers: {
+                'Authorization': `Bearer ${localStorage.getItem('token')}`
+            }
+        });
+        const data = await response.json();
+        if (data.reset) {
+            return fetchPosts();
+        }
+
+        // Posts past the last loaded one belong to pages not loaded yet;
+        // "Load more" brings them in with their current counts
+        const oldest = loadedPosts[loadedPosts.length - 1];
+        const byId = new Map(loadedPosts.map(post => [post.id, post]));
+        data.posts
+            .filter(post => byId.has(post.id) || !nextCursor || !oldest || newestFirst(post, oldest) < 0)
+            .forEach(post => byId.set(post.id, post));
+        loadedPosts = Array.from(byId.values()).sort(newestFirst);
+        feedVersion = data.version;
+        displayPosts(loadedPosts);
+    } catch (error) {
+        console.error('Error fetching post changes:', error);
+    }
+}
+
+// User-written text is escaped before it goes into the markup
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
 // Display posts
 function displayPosts(posts) {
     postsContainer.innerHTML = posts.map(post => `
         <div class="post" data-id="${post.id}" data-genre-id="${post.genre_id}">
             <div class="post-header">
                 <div class="post-meta">
-                    <span class="post-genre">${post.genre_name}</span>
+                    <span class="post-genre">${escapeHtml(post.genre_name)}</span>
                     <span class="post-date">${new Date(post.created_at).toLocaleDateString()}</span>
                 </div>
             </div>
-            <div class="post-content">${post.post_text}</div>
+            <div class="post-content">${escapeHtml(post.post_text)}</div>
             <div class="post-actions">
-                <button onclick="votePost('${post.id}', 'up')" class="vote-btn">
+                <button onclick="votePost('${post.id}', '${post.my_vote === 'up' ? 'none' : 'up'}')" class="vote-btn ${post.my_vote === 'up' ? 'voted' : ''}">
                     <i class="fas fa-thumbs-up"></i> ${post.up_vote_count}
                 </button>
-                <button onclick="votePost('${post.id}', 'down')" class="vote-btn">
+                <button onclick="votePost('${post.id}', '${post.my_vote === 'down' ? 'none' : 'down'}')" class="vote-btn ${post.my_vote === 'down' ? 'voted' : ''}">
                     <i class="fas fa-thumbs-down"></i> ${post.down_vote_count}
                 </button>
                 <button onclick="sharePost('${post.id}')" class="share-btn">
                     <i class="fas fa-share"></i> ${post.share_count}
                 </button>
+                <span class="comment-count">
+                    <i class="fas fa-comment"></i> ${post.comment_count}
+                </span>
+            </div>
+            <div class="post-comments">
+                ${post.comments.map(comment => `
+                    <div class="comment">${escapeHtml(comment.comment_text)}</div>
+                `).join('')}
+                <div class="comment-form">
+                    <input type="text" id="comment-${post.id}" placeholder="Write a comment...">
+                    <button onclick="commentPost('${post.id}')">Comment</button>
+                </div>
             </div>
         </div>
-    `).join('');
+    `).join('') + (nextCursor ? `
+        <button onclick="fetchPosts(true)" class="load-more-btn">Load more</button>
+    ` : '');
 }
 
 // Create new post
@@ -73,8 +152,8 @@ submitPostBtn.addEventListener('click', async () => {
             // Clear form and close modal
             newPostTextarea.value = '';
             document.getElementById('postModal').classList.add('hidden');
-            // Refresh posts
-            fetchPosts();
+            // Pick up the new post
+            refreshChanges();
         } else {
             const data = await response.json();
             alert(data.message || 'Failed to create post');
@@ -98,7 +177,7 @@ async function votePost(postId, voteType) {
         });
 
         if (response.ok) {
-            fetchPosts();
+            refreshChanges();
         }
     } catch (error) {
         console.error('Error voting on post:', error);
@@ -116,13 +195,39 @@ async function sharePost(postId) {
         });
 
         if (response.ok) {
-            fetchPosts();
+            refreshChanges();
         }
     } catch (error) {
         console.error('Error sharing post:', error);
     }
 }
 
+// Comment on post
+async function commentPost(postId) {
+    const input = document.getElementById(`comment-${postId}`);
+    const commentText = input.value.trim();
+    if (!commentText) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`${API_URL}/posts/${postId}/comments`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${localStorage.getItem('token')}`
+            },
+            body: JSON.stringify({ comment_text: commentText })
+        });
+
+        if (response.ok) {
+            refreshChanges();
+        }
+    } catch (error) {
+        console.error('Error commenting on post:', error);
+    }
+}
+
 // Populate genre select in post modal
 async function populateGenreSelect() {
     try {
@@ -141,6 +246,53 @@ async function populateGenreSelect() {
     }
 }
 
+// Expose handlers used by inline onclick attributes
+window.fetchPosts = fetchPosts;
+window.commentPost = commentPost;
+
+// Live updates: the stream tells us something changed, /posts/changes says what.
+// EventSource cannot send the Authorization header, so read the stream with fetch.
+let refreshTimer = null;
+
+function scheduleRefresh() {
+    clearTimeout(refreshTimer);
+    refreshTimer = setTimeout(refreshChanges, 250);
+}
+
+async function listenForUpdates() {
+    try {
+        const response = await fetch(`${API_URL}/posts/stream`, {
+            headers: {
+                'Authorization': `Bearer ${localStorage.getItem('token')}`
+            }
+        });
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += value;
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            events.forEach(event => {
+                if (/^event: (post_created|post_updated|comment_created)$/m.test(event)) {
+                    scheduleRefresh();
+                }
+            });
+        }
+    } catch (error) {
+        console.error('Post stream closed:', error);
+    }
+    // Reconnect and resync after the stream ends or we were dropped
+    setTimeout(() => {
+        scheduleRefresh();
+        listenForUpdates();
+    }, 3000);
+}
+
 // Initialize
 fetchPosts();
+listenForUpdates();
 populateGenreSelect(); 
\ No newline at end of file